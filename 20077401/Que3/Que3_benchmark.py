@@ -0,0 +1,89 @@
+import socket
+import json
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import subprocess
+import multiprocessing
+
+HOST = '127.0.0.1'
+PORT = 9999
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Que3_server.py")
+
+VALID = {
+    "name": "Bench Applicant",
+    "address": "1 Dublin Road",
+    "qualifications": "BSc Computing",
+    "course": "MSc Data Analytics",
+    "start_year": "2026",
+    "start_month": "9"
+}
+# Rejected by validation, so no database write: measures parsing/validation only
+INVALID = dict(VALID, course="MSc Astrology")
+
+
+def send_application(payload: bytes) -> dict:
+    with socket.create_connection((HOST, PORT)) as sock:
+        sock.sendall(payload)
+        return json.loads(sock.recv(4096).decode())
+
+
+def client_loop(args):
+    """Send applications back to back until the deadline, return how many."""
+    payload, deadline = args
+    done = 0
+    while time.time() < deadline:
+        send_application(payload)
+        done += 1
+    return done
+
+
+def wait_for_server():
+    for _ in range(100):
+        try:
+            socket.create_connection((HOST, PORT)).close()
+            return
+        except ConnectionRefusedError:
+            time.sleep(0.05)
+    raise RuntimeError("Server did not start.")
+
+
+def run(workers, clients, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        server = subprocess.Popen(
+            [sys.executable, SERVER, "--workers", str(workers), "--quiet"],
+            cwd=tmp, stdout=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_server()
+            results = {}
+            for label, data in (("validate", INVALID), ("save", VALID)):
+                payload = json.dumps(data).encode()
+                deadline = time.time() + seconds
+                with multiprocessing.Pool(clients) as pool:
+                    total = sum(pool.map(client_loop, [(payload, deadline)] * clients))
+                results[label] = total / seconds
+        finally:
+            server.terminate()
+            server.wait()
+
+        # Registration numbers must be unique and gap-free across workers
+        conn = sqlite3.connect(os.path.join(tmp, "dbs_admissions.db"))
+        count, distinct, highest = conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT registration_number), MAX(id) FROM applications"
+        ).fetchone()
+        conn.close()
+        results["numbers_ok"] = count == distinct == highest
+    return results
+
+
+if __name__ == "__main__":
+    seconds = 3
+    clients = 8
+    print(f"CPUs: {os.cpu_count()}, clients: {clients}, {seconds}s per run")
+    print(f"{'workers':>8}{'validate req/s':>16}{'save req/s':>12}{'numbers ok':>12}")
+    for workers in (1, 2, 4):
+        r = run(workers, clients, seconds)
+        print(f"{workers:>8}{r['validate']:>16.0f}{r['save']:>12.0f}{str(r['numbers_ok']):>12}")
@@ -2,11 +2,26 @@ import socket
 import sqlite3
 import json
 import datetime
+import argparse
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+import time
+
+HOST = '127.0.0.1'
+PORT = 9999
+DB_FILE = "dbs_admissions.db"
+
+CLIENT_TIMEOUT = 5        # seconds a pre-fork worker waits on one client
+MIN_UPTIME = 1.0          # a worker that dies sooner than this failed to start
+MAX_QUICK_FAILURES = 5    # in a row, before the supervisor gives up
 
 
 def init_db():
     """Create SQLite database and table if not exists."""
-    conn = sqlite3.connect("dbs_admissions.db")
+    conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -34,37 +49,53 @@ def generate_reg_number(row_id: int) -> str:
 
 
 def save_application(data: dict) -> str:
-    """Connect to DB"""
-    conn = sqlite3.connect("dbs_admissions.db")
+    """Save application and allocate its registration number.
+
+    This is the shared allocator for all server processes: BEGIN IMMEDIATE
+    takes SQLite's write lock before the insert, so only one process at a
+    time can allocate. The row id and its registration number are written
+    in the same transaction, so a failure rolls both back and numbers stay
+    unique and gap-free.
+    """
+    # isolation_level=None: we issue BEGIN/COMMIT ourselves
+    conn = sqlite3.connect(DB_FILE, timeout=30, isolation_level=None)
     cursor = conn.cursor()
 
-    # Insert with temporary registration_number to get row id
-    cursor.execute("""
-        INSERT INTO applications
-        (name, address, qualifications, course, start_year, start_month, registration_number, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        data["name"],
-        data["address"],
-        data["qualifications"],
-        data["course"],
-        data["start_year"],
-        data["start_month"],
-        "TEMP",  # placeholder
-        datetime.datetime.now().isoformat()
-    ))
-
-    row_id = cursor.lastrowid
-    reg_no = generate_reg_number(row_id)
-
-    cursor.execute("""
-        UPDATE applications
-        SET registration_number = ?
-        WHERE id = ?
-    """, (reg_no, row_id))
-
-    conn.commit()
-    conn.close()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+
+        # Insert with temporary registration_number to get row id
+        cursor.execute("""
+            INSERT INTO applications
+            (name, address, qualifications, course, start_year, start_month, registration_number, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            data["name"],
+            data["address"],
+            data["qualifications"],
+            data["course"],
+            data["start_year"],
+            data["start_month"],
+            "TEMP",  # placeholder, only one writer holds the lock
+            datetime.datetime.now().isoformat()
+        ))
+
+        row_id = cursor.lastrowid
+        reg_no = generate_reg_number(row_id)
+
+        cursor.execute("""
+            UPDATE applications
+            SET registration_number = ?
+            WHERE id = ?
+        """, (reg_no, row_id))
+
+        cursor.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
     return reg_no
 
 
@@ -109,6 +140,44 @@ def validate_application(data: dict):
     return True, None
 
 
+def handle_client(conn):
+    """Read one application from a connected client and send the response."""
+    # Receive data from client
+    raw = conn.recv(4096)
+    if not raw:
+        print("No data received from client.")
+        return
+
+    text = raw.decode()
+    print("Raw data from client:", text)
+
+    # Try to parse JSON
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        error_msg = {"status": "error", "message": "Invalid JSON format."}
+        conn.sendall(json.dumps(error_msg).encode())
+        return
+
+    # Validate data
+    is_valid, error_message = validate_application(data)
+    if not is_valid:
+        error_msg = {"status": "error", "message": error_message}
+        conn.sendall(json.dumps(error_msg).encode())
+        return
+
+    # Save and generate registration number
+    reg_no = save_application(data)
+    print("Application saved with registration number:", reg_no)
+
+    # Send success response
+    response = {
+        "status": "ok",
+        "registration_number": reg_no
+    }
+    conn.sendall(json.dumps(response).encode())
+
+
 def DBS_Server():
     sock = None
     conn = None
@@ -117,8 +186,8 @@ def DBS_Server():
         print("Database initialised (dbs_admissions.db).")
 
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # connection-oriented
-        host = '127.0.0.1'
-        port = 9999
+        host = HOST
+        port = PORT
 
         print(sock)
         sock.bind((host, port))
@@ -130,40 +199,7 @@ def DBS_Server():
         conn, addr = sock.accept()
         print("Received connection request from client ", addr)
 
-        # Receive data from client
-        raw = conn.recv(4096)
-        if not raw:
-            print("No data received from client.")
-            return
-
-        text = raw.decode()
-        print("Raw data from client:", text)
-
-        # Try to parse JSON
-        try:
-            data = json.loads(text)
-        except json.JSONDecodeError:
-            error_msg = {"status": "error", "message": "Invalid JSON format."}
-            conn.sendall(json.dumps(error_msg).encode())
-            return
-
-        # Validate data
-        is_valid, error_message = validate_application(data)
-        if not is_valid:
-            error_msg = {"status": "error", "message": error_message}
-            conn.sendall(json.dumps(error_msg).encode())
-            return
-
-        # Save and generate registration number
-        reg_no = save_application(data)
-        print("Application saved with registration number:", reg_no)
-
-        # Send success response
-        response = {
-            "status": "ok",
-            "registration_number": reg_no
-        }
-        conn.sendall(json.dumps(response).encode())
+        handle_client(conn)
 
     except TimeoutError:
         print("Server stopped running (timeout, no client connected).")
@@ -183,5 +219,138 @@ def DBS_Server():
             sock.close()
 
 
+def DBS_Worker(worker_id: int, quiet: bool = False):
+    """Pre-fork worker: bind the shared port with SO_REUSEPORT and serve forever.
+
+    The kernel spreads incoming connections across all workers bound to the
+    port, so parsing and validation run on every core.
+    """
+    # The supervisor's SIGTERM handler is inherited through fork
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if quiet:
+        # Per-request prints would dominate a benchmark
+        sys.stdout = open(os.devnull, "w")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    try:
+        sock.bind((HOST, PORT))
+    except OSError as e:
+        print(f"Worker {worker_id} cannot bind {HOST}:{PORT}: {e}", file=sys.stderr)
+        sys.exit(1)
+    sock.listen(128)
+    print(f"Worker {worker_id} (pid {os.getpid()}) is listening......")
+
+    while True:
+        conn, addr = sock.accept()
+        # An idle client must not hold this worker forever
+        conn.settimeout(CLIENT_TIMEOUT)
+        try:
+            handle_client(conn)
+        except TimeoutError:
+            print(f"Worker {worker_id}: client {addr} timed out.")
+        except Exception as e:
+            print(f"Worker {worker_id} error:")
+            print(e)
+            try:
+                error_msg = {"status": "error", "message": "Server internal error."}
+                conn.sendall(json.dumps(error_msg).encode())
+            except:
+                pass
+        finally:
+            conn.close()
+
+
+def _shutdown(signum, frame):
+    raise SystemExit(0)
+
+
+def DBS_Server_Prefork(workers: int, quiet: bool = False):
+    """Supervisor: start `workers` processes and restart any that crash.
+
+    Workers that keep dying right after start (e.g. the port is taken) are
+    restarted with a growing delay, and after MAX_QUICK_FAILURES in a row the
+    supervisor gives up. Returns 1 in that case.
+    """
+    if not hasattr(socket, "SO_REUSEPORT"):
+        print("Pre-fork mode needs SO_REUSEPORT (Linux/macOS).")
+        return 1
+
+    init_db()
+    print("Database initialised (dbs_admissions.db).")
+
+    # SIGTERM (e.g. from a service manager) stops the workers too
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    started_at = {}
+
+    def start(worker_id):
+        process = multiprocessing.Process(
+            target=DBS_Worker, args=(worker_id, quiet), daemon=True
+        )
+        process.start()
+        started_at[worker_id] = time.monotonic()
+        return process
+
+    processes = {}
+    restart_at = {}
+    quick_failures = 0
+    try:
+        for worker_id in range(workers):
+            processes[worker_id] = start(worker_id)
+        print(f"\nServer is ready with {workers} workers on {HOST}:{PORT}.....")
+
+        while True:
+            # Block until a worker exits or a delayed restart is due
+            timeout = None
+            if restart_at:
+                timeout = max(0, min(restart_at.values()) - time.monotonic())
+            multiprocessing.connection.wait(
+                [p.sentinel for p in processes.values()], timeout
+            )
+            now = time.monotonic()
+
+            for worker_id, process in list(processes.items()):
+                if process.is_alive():
+                    continue
+                del processes[worker_id]
+                if now - started_at[worker_id] < MIN_UPTIME:
+                    quick_failures += 1
+                else:
+                    quick_failures = 0
+                if quick_failures >= MAX_QUICK_FAILURES:
+                    print("Workers keep failing right after start, giving up.")
+                    return 1
+                delay = 0.1 * 2 ** quick_failures if quick_failures else 0
+                print(f"Worker {worker_id} exited (code {process.exitcode}), "
+                      f"restarting in {delay:.1f}s.")
+                restart_at[worker_id] = now + delay
+
+            for worker_id, when in list(restart_at.items()):
+                if when <= now:
+                    del restart_at[worker_id]
+                    processes[worker_id] = start(worker_id)
+    except (KeyboardInterrupt, SystemExit):
+        print("\nServer shutting down.....")
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join()
+
+
 if __name__ == "__main__":
-    DBS_Server()
+    parser = argparse.ArgumentParser(description="DBS admission server")
+    parser.add_argument(
+        "--workers", type=int, default=0,
+        help="Run N pre-forked worker processes (default: single client, single process)",
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="Don't print every request (pre-fork mode)"
+    )
+    args = parser.parse_args()
+
+    if args.workers > 0:
+        sys.exit(DBS_Server_Prefork(args.workers, quiet=args.quiet))
+    else:
+        DBS_Server()
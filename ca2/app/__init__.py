@@ -1,4 +1,5 @@
 from flask import Flask
+from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import CSRFProtect
 from config import Config
@@ -12,6 +13,7 @@ except:
 
 db = SQLAlchemy()
 csrf = CSRFProtect()
+migrate = Migrate()
 
 
 def create_app(test_config=None):
@@ -28,18 +30,40 @@ def create_app(test_config=None):
 
     db.init_app(app)
     csrf.init_app(app)
+    migrate.init_app(app, db)
+
+    from .cache import init_cache
+    init_cache(app)
+
+    from .categories import init_categories
+    init_categories(app)
 
     from .routes import main
     app.register_blueprint(main)
 
+    from .api import api
+    csrf.exempt(api)  # token authenticated, no session cookie involved
+    app.register_blueprint(api)
+
+    from .recurring import init_recurring
+    init_recurring(app)
+
+    from .archive import init_archive
+    init_archive(app)
+
     from .models import User
 
     @app.context_processor
     def inject_user_model():
         return dict(User=User)
 
-    with app.app_context():
-        db.create_all()
+    # Off by default: `flask db upgrade` manages the schema (see config.py)
+    if app.config["SCHEMA_AUTO_CREATE"]:
+        with app.app_context():
+            db.create_all()
+
+    from .search import init_search
+    init_search(app)
 
     return app
 
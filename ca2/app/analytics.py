@@ -0,0 +1,155 @@
+from app import db
+from app.archive import archive_state
+from app.categories import get_category_cache
+from app.models import ArchivedExpense, Expense, ExpenseMonthSummary
+
+PERIODS = ("month", "week")
+
+
+def _bucket_expression(period, model=Expense):
+    """SQL expression that maps `model.datetime` to a month or week label.
+
+    Weeks start on Monday (same as the dashboard) and are labelled with the
+    date of that Monday. Months are labelled YYYY-MM.
+    """
+    dialect = db.engines[getattr(model, "__bind_key__", None)].dialect.name
+    column = model.datetime
+
+    if period == "month":
+        if dialect == "postgresql":
+            return db.func.to_char(column, "YYYY-MM")
+        if dialect == "mysql":
+            return db.func.date_format(column, "%Y-%m")
+        return db.func.strftime("%Y-%m", column)
+
+    if dialect == "postgresql":
+        return db.func.to_char(db.func.date_trunc("week", column), "YYYY-MM-DD")
+    if dialect == "mysql":
+        return db.func.date_format(
+            db.func.subdate(column, db.func.weekday(column)), "%Y-%m-%d"
+        )
+    # 'weekday 0' moves forward to Sunday, then step back to that week's Monday
+    return db.func.date(column, "weekday 0", "-6 days")
+
+
+def _bucket_totals(model, user_id, period, *criteria):
+    # (label, income, spent, count) per bucket
+    bucket = _bucket_expression(period, model).label("bucket")
+    income = db.func.sum(db.case((model.amount > 0, model.amount), else_=0))
+    spent = db.func.sum(db.case((model.amount < 0, model.amount), else_=0))
+    return (
+        db.session.query(bucket, income, spent, db.func.count(model.id))
+        .filter(model.user_id == user_id, *criteria)
+        .group_by(bucket)
+        .all()
+    )
+
+
+def _archived_weeks(user_id):
+    # The monthly summary has no weekly grain, so archived weeks are bucketed
+    # from the archived rows, exactly the ones the summary already counts
+    watermark, published = archive_state(user_id)
+    if watermark is None:
+        return []
+    return _bucket_totals(
+        ArchivedExpense,
+        user_id,
+        "week",
+        ArchivedExpense.batch <= published,
+    )
+
+
+def _archived_totals(user_id, group_by):
+    # Archived expenses only exist as monthly summary rows
+    return (
+        db.session.query(
+            group_by,
+            db.func.sum(ExpenseMonthSummary.total),
+            db.func.sum(ExpenseMonthSummary.income),
+            db.func.sum(ExpenseMonthSummary.spent),
+            db.func.sum(ExpenseMonthSummary.count),
+        )
+        .filter(ExpenseMonthSummary.user_id == user_id)
+        .group_by(group_by)
+        .all()
+    )
+
+
+def category_totals(user_id):
+    """Total, spent and count per category, largest spend first."""
+    spent = db.func.sum(db.case((Expense.amount < 0, Expense.amount), else_=0))
+    rows = (
+        db.session.query(
+            Expense.category_id,
+            db.func.sum(Expense.amount),
+            spent,
+            db.func.count(Expense.id),
+        )
+        .filter(Expense.user_id == user_id)
+        .group_by(Expense.category_id)
+        .all()
+    )
+    merged = {
+        category_id: [total or 0, spent_sum or 0, count]
+        for category_id, total, spent_sum, count in rows
+    }
+    for category_id, total, _, spent_sum, count in _archived_totals(
+        user_id, ExpenseMonthSummary.category_id
+    ):
+        entry = merged.setdefault(category_id, [0, 0, 0])
+        entry[0] += total
+        entry[1] += spent_sum
+        entry[2] += count
+
+    cache = get_category_cache()
+    totals = [
+        {
+            "category": cache.get_name(category_id),
+            "total": round(total, 2),
+            "spent": round(abs(spent_sum), 2),
+            "count": count,
+        }
+        for category_id, (total, spent_sum, count) in merged.items()
+    ]
+    totals.sort(key=lambda row: (-row["spent"], row["category"].casefold()))
+    return totals
+
+
+def time_series(user_id, period="month"):
+    """Income, spend and net per month or week, oldest bucket first.
+
+    Archived expenses come from the monthly summary for months, and from the
+    archive database for weeks.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period: {period}")
+
+    merged = {}
+    if period == "month":
+        archived = [
+            (month, income_sum, spent_sum, count)
+            for month, _, income_sum, spent_sum, count in _archived_totals(
+                user_id, ExpenseMonthSummary.month
+            )
+        ]
+    else:
+        archived = _archived_weeks(user_id)
+    # A week or month can be partly archived
+    for label, income_sum, spent_sum, count in (
+        _bucket_totals(Expense, user_id, period) + archived
+    ):
+        entry = merged.setdefault(str(label), [0, 0, 0])
+        entry[0] += income_sum or 0
+        entry[1] += spent_sum or 0
+        entry[2] += count
+
+    return [
+        {
+            "period": label,
+            "income": round(income_sum, 2),
+            "spent": round(abs(spent_sum), 2),
+            "net": round(income_sum + spent_sum, 2),
+            "count": count,
+        }
+        for label, (income_sum, spent_sum, count) in sorted(merged.items())
+    ]
@@ -0,0 +1,258 @@
+import base64
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+import jwt
+from flask import Blueprint, current_app, g, jsonify, request
+
+from app import db
+from app.archive import archive_state, expense_page
+from app.cache import bump_data_version
+from app.categories import find_category_id, get_or_create_category_id
+from app.models import ArchivedExpense, Expense, User
+
+api = Blueprint("api", __name__, url_prefix="/api")
+
+
+def error(message, status=400):
+    return jsonify({"error": message}), status
+
+
+# Token Authentication
+def create_token(user_id):
+    now = datetime.now(timezone.utc)
+    payload = {
+        "sub": str(user_id),
+        "iat": now,
+        "exp": now + timedelta(seconds=current_app.config["API_TOKEN_EXPIRES"]),
+    }
+    return jwt.encode(payload, current_app.config["SECRET_KEY"], algorithm="HS256")
+
+
+def token_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        header = request.headers.get("Authorization", "")
+        scheme, _, token = header.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return error("Missing bearer token.", 401)
+        try:
+            payload = jwt.decode(
+                token, current_app.config["SECRET_KEY"], algorithms=["HS256"]
+            )
+        except jwt.InvalidTokenError:
+            return error("Invalid or expired token.", 401)
+        g.user_id = int(payload["sub"])
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+# Request Parsing Helpers
+def parse_datetime(value):
+    """Parse an ISO 8601 string into the naive UTC datetime stored in the DB."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_expense(item):
+    if not isinstance(item, dict):
+        raise ValueError("must be an object")
+
+    category = item.get("category")
+    if not isinstance(category, str) or not category.split():
+        raise ValueError("category is required")
+    if len(category) > 100:
+        raise ValueError("category is too long")
+
+    amount = item.get("amount")
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+        raise ValueError("amount must be a number")
+
+    note = item.get("note") or None
+    if note is not None and (not isinstance(note, str) or len(note) > 200):
+        raise ValueError("note must be a string of at most 200 characters")
+
+    fields = {"category": category, "amount": float(amount), "note": note}
+    if item.get("datetime"):
+        if not isinstance(item["datetime"], str):
+            raise ValueError("datetime must be an ISO 8601 string")
+        fields["datetime"] = parse_datetime(item["datetime"])
+    return fields
+
+
+def encode_cursor(expense):
+    raw = f"{expense.datetime.isoformat()}|{expense.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    when, _, expense_id = raw.partition("|")
+    return datetime.fromisoformat(when), int(expense_id)
+
+
+def expense_to_dict(expense):
+    return {
+        "id": expense.id,
+        "category": expense.category.name,
+        "amount": expense.amount,
+        "note": expense.note,
+        "datetime": expense.datetime.isoformat(),
+        "archived": expense.archived,
+    }
+
+
+def get_json_list(key):
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get(key), list):
+        raise ValueError(f"Body must be a JSON object with a '{key}' list.")
+    items = data[key]
+    if not items:
+        raise ValueError(f"'{key}' must not be empty.")
+    if len(items) > current_app.config["API_MAX_BATCH"]:
+        raise ValueError(
+            f"At most {current_app.config['API_MAX_BATCH']} items per request."
+        )
+    return items
+
+
+# Get Token
+@api.route("/token", methods=["POST"])
+def token():
+    data = request.get_json(silent=True) or {}
+    user = User.query.filter_by(email=data.get("email")).first()
+    if not user or not user.check_password(data.get("password") or ""):
+        return error("Invalid credentials.", 401)
+    return jsonify(
+        {
+            "token": create_token(user.id),
+            "expires_in": current_app.config["API_TOKEN_EXPIRES"],
+        }
+    )
+
+
+# List Expenses (keyset pagination, newest first)
+@api.route("/expenses", methods=["GET"])
+@token_required
+def list_expenses():
+    try:
+        limit = min(
+            int(request.args.get("limit", 50)), current_app.config["API_MAX_PAGE"]
+        )
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return error("limit must be a positive integer.")
+
+    filters = {}
+    try:
+        if request.args.get("category"):
+            category_id = find_category_id(request.args["category"])
+            if category_id is None:
+                return jsonify({"expenses": [], "next_cursor": None})
+            filters["category_id"] = category_id
+        if request.args.get("since"):
+            filters["since"] = parse_datetime(request.args["since"])
+        if request.args.get("until"):
+            filters["until"] = parse_datetime(request.args["until"])
+    except ValueError:
+        return error("since/until must be ISO 8601 datetimes.")
+
+    if request.args.get("cursor"):
+        try:
+            filters["before"] = decode_cursor(request.args["cursor"])
+        except ValueError:
+            return error("Invalid cursor.")
+
+    # Reads the archive too once the page goes back that far
+    page, has_more = expense_page(g.user_id, limit, **filters)
+    next_cursor = encode_cursor(page[-1]) if has_more else None
+
+    return jsonify(
+        {
+            "expenses": [expense_to_dict(expense) for expense in page],
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+# Batch Create
+@api.route("/expenses/batch", methods=["POST"])
+@token_required
+def create_expenses():
+    try:
+        items = get_json_list("expenses")
+    except ValueError as e:
+        return error(str(e))
+
+    parsed = []
+    for index, item in enumerate(items):
+        try:
+            parsed.append(parse_expense(item))
+        except ValueError as e:
+            return error(f"expenses[{index}]: {e}")
+
+    new_expenses = [
+        Expense(
+            user_id=g.user_id,
+            category_id=get_or_create_category_id(fields.pop("category")),
+            **fields,
+        )
+        for fields in parsed
+    ]
+
+    # All rows are inserted in one transaction, nothing is saved if any fails
+    db.session.add_all(new_expenses)
+    db.session.flush()
+    created = [expense_to_dict(expense) for expense in new_expenses]
+    bump_data_version(g.user_id)
+    db.session.commit()
+
+    return jsonify({"created": created}), 201
+
+
+# Batch Delete
+@api.route("/expenses/batch-delete", methods=["POST"])
+@token_required
+def delete_expenses():
+    try:
+        ids = get_json_list("ids")
+    except ValueError as e:
+        return error(str(e))
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return error("ids must be integers.")
+
+    owned = Expense.query.filter(
+        Expense.user_id == g.user_id, Expense.id.in_(set(ids))
+    )
+    found = {expense_id for (expense_id,) in owned.with_entities(Expense.id)}
+    if found:
+        owned.delete(synchronize_session=False)
+        bump_data_version(g.user_id)
+        db.session.commit()
+
+    # Archived expenses are read-only, tell clients they do exist
+    missing = set(ids) - found
+    archived = set()
+    watermark, published = archive_state(g.user_id) if missing else (None, 0)
+    # No watermark, nothing archived: the table may not even exist yet
+    if watermark is not None:
+        archived = {
+            expense_id
+            for (expense_id,) in db.session.query(ArchivedExpense.id).filter(
+                ArchivedExpense.user_id == g.user_id,
+                ArchivedExpense.batch <= published,
+                ArchivedExpense.id.in_(missing),
+            )
+        }
+
+    return jsonify(
+        {
+            "deleted": sorted(found),
+            "archived": sorted(archived),
+            "not_found": sorted(missing - archived),
+        }
+    )
@@ -0,0 +1,357 @@
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app import db
+from app.cache import bump_data_version
+from app.models import ArchivedExpense, Expense, ExpenseMonthSummary, User
+
+ARCHIVE_COLUMNS = (
+    "id",
+    "user_id",
+    "category_id",
+    "amount",
+    "note",
+    "datetime",
+    "recurring_id",
+)
+
+
+def _start_of_month(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def archive_cutoff(now=None, days=None):
+    """Expenses dated before this are archived.
+
+    The start of the month `days` ago, and never later than the start of the
+    previous month, so the dashboard's weekly and monthly totals only ever
+    need the expense table.
+    """
+    now = now or datetime.utcnow()
+    if days is None:
+        days = current_app.config["ARCHIVE_AFTER_DAYS"]
+    previous_month = _start_of_month(_start_of_month(now) - timedelta(days=1))
+    return min(_start_of_month(now - timedelta(days=days)), previous_month)
+
+
+def _add_to_summary(user_id, rows):
+    totals = defaultdict(lambda: [0.0, 0.0, 0.0, 0])
+    for row in rows:
+        entry = totals[(f"{row.datetime:%Y-%m}", row.category_id)]
+        entry[0] += row.amount
+        entry[1 if row.amount > 0 else 2] += row.amount
+        entry[3] += 1
+
+    existing = {
+        (summary.month, summary.category_id): summary
+        for summary in ExpenseMonthSummary.query.filter(
+            ExpenseMonthSummary.user_id == user_id,
+            ExpenseMonthSummary.month.in_({month for month, _ in totals}),
+        )
+    }
+    for (month, category_id), (total, income, spent, count) in totals.items():
+        summary = existing.get((month, category_id))
+        if summary is None:
+            summary = ExpenseMonthSummary(
+                user_id=user_id,
+                month=month,
+                category_id=category_id,
+                total=0,
+                income=0,
+                spent=0,
+                count=0,
+            )
+            db.session.add(summary)
+        summary.total += total
+        summary.income += income
+        summary.spent += spent
+        summary.count += count
+
+
+def _reserve_archived_ids():
+    # Archived rows keep their expense id, so SQLite must never hand it out
+    # again. AUTOINCREMENT guarantees that from now on; this covers rows
+    # archived before the expense table used it.
+    if db.engines[None].dialect.name != "sqlite":
+        return
+    highest = db.session.query(db.func.max(ArchivedExpense.id)).scalar()
+    if highest is None:
+        return
+    seq = db.session.execute(
+        db.text("SELECT seq FROM sqlite_sequence WHERE name = 'expense'")
+    ).scalar()
+    if seq is None:
+        db.session.execute(
+            db.text("INSERT INTO sqlite_sequence (name, seq) VALUES ('expense', :id)"),
+            {"id": highest},
+        )
+    elif seq < highest:
+        db.session.execute(
+            db.text("UPDATE sqlite_sequence SET seq = :id WHERE name = 'expense'"),
+            {"id": highest},
+        )
+    db.session.commit()
+
+
+def _add_batch_column():
+    # Archives written before batches were numbered. The archive bind is not
+    # managed by Flask-Migrate (see migration 0004).
+    bind = db.engines["archive"]
+    columns = db.inspect(bind).get_columns(ArchivedExpense.__tablename__)
+    if any(column["name"] == "batch" for column in columns):
+        return
+    for statement in (
+        "ALTER TABLE archived_expense ADD COLUMN batch INTEGER NOT NULL DEFAULT 0",
+        "CREATE INDEX ix_archived_expense_user_batch "
+        "ON archived_expense (user_id, batch)",
+    ):
+        db.session.execute(db.text(statement), bind_arguments={"bind": bind})
+    db.session.commit()
+
+
+def _drop_unfinished_batches():
+    """Delete the copies of batches an interrupted run never finished.
+
+    They were never listed (their batch is above the user's archive_batch)
+    and their rows are still in the expense table, or were deleted by the
+    user since. Their ids have to be free before those rows are archived
+    again.
+    """
+    latest = db.session.execute(
+        db.select(ArchivedExpense.user_id, db.func.max(ArchivedExpense.batch))
+        .group_by(ArchivedExpense.user_id)
+    ).all()
+    for user_id, batch in latest:
+        published = (
+            db.session.query(User.archive_batch).filter(User.id == user_id).scalar()
+        )
+        if published is not None and batch > published:
+            db.session.execute(
+                db.delete(ArchivedExpense).where(
+                    ArchivedExpense.user_id == user_id,
+                    ArchivedExpense.batch > published,
+                )
+            )
+    db.session.commit()
+
+
+def archive_expenses(now=None, days=None, batch_size=None):
+    """Move every expense dated before the cutoff to the archive database.
+
+    Works per user in numbered batches of `batch_size` (oldest first). A
+    batch is copied to the archive and committed there first; readers skip
+    it until User.archive_batch reaches its number. Then one transaction
+    folds it into the monthly summary, deletes it from the expense table and
+    sets archive_batch and the watermark, which makes the copies visible. A
+    run that dies in between leaves copies nobody lists, and the next run
+    drops them. Returns (expenses moved, users processed).
+    """
+    cutoff = archive_cutoff(now, days)
+    batch_size = batch_size or current_app.config["ARCHIVE_BATCH_SIZE"]
+    db.create_all(bind_key="archive")
+    _add_batch_column()
+    _reserve_archived_ids()
+    _drop_unfinished_batches()
+    columns = [getattr(Expense, name) for name in ARCHIVE_COLUMNS]
+    moved = 0
+
+    # Also users a previous run stopped part way through, and rows backdated
+    # since; one index probe per user
+    user_ids = db.session.scalars(
+        db.select(User.id)
+        .where(
+            db.select(Expense.id)
+            .where(Expense.user_id == User.id, Expense.datetime < cutoff)
+            .exists()
+        )
+        .order_by(User.id)
+    ).all()
+    # Never moves back, e.g. when a later run uses a larger --days
+    watermark = db.case(
+        (User.archived_before > cutoff, User.archived_before), else_=cutoff
+    )
+
+    for user_id in user_ids:
+        batch = (
+            db.session.query(User.archive_batch).filter(User.id == user_id).scalar()
+        )
+        while True:
+            rows = (
+                db.session.query(*columns)
+                .filter(Expense.user_id == user_id, Expense.datetime < cutoff)
+                .order_by(Expense.datetime, Expense.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            batch += 1
+            ids = [row.id for row in rows]
+
+            archived_at = datetime.utcnow()
+            db.session.execute(
+                db.insert(ArchivedExpense.__table__),
+                [
+                    dict(row._asdict(), batch=batch, archived_at=archived_at)
+                    for row in rows
+                ],
+            )
+            db.session.commit()
+
+            live = (
+                db.session.query(*columns)
+                .filter(Expense.id.in_(ids))
+                .order_by(Expense.datetime, Expense.id)
+                .with_for_update()
+                .all()
+            )
+            if live != rows:
+                # Changed or deleted since it was copied: start the batch over
+                db.session.rollback()
+                db.session.execute(
+                    db.delete(ArchivedExpense).where(
+                        ArchivedExpense.user_id == user_id,
+                        ArchivedExpense.batch == batch,
+                    )
+                )
+                db.session.commit()
+                batch -= 1
+                continue
+            _add_to_summary(user_id, rows)
+            db.session.execute(
+                db.delete(Expense).where(Expense.id.in_(ids)),
+                execution_options={"synchronize_session": False},
+            )
+            # Readers trust the watermark from this commit on
+            db.session.execute(
+                db.update(User)
+                .where(User.id == user_id)
+                .values(archive_batch=batch, archived_before=watermark)
+            )
+            bump_data_version(user_id)
+            db.session.commit()
+            db.session.expunge_all()
+            moved += len(rows)
+
+    return moved, len(user_ids)
+
+
+def archive_state(user_id):
+    """(watermark, published batch) of a user.
+
+    Expenses dated before the watermark may be archived. It is None until a
+    first batch of the user's is archived, and readers must not touch the
+    archive before that (its table may not even exist yet). Archived rows of
+    later batches than the published one are unfinished copies.
+    """
+    return (
+        db.session.query(User.archived_before, User.archive_batch)
+        .filter(User.id == user_id)
+        .one()
+    )
+
+
+def archived_balance(user_id):
+    """Sum of all archived amounts of a user, from the monthly summary."""
+    return (
+        db.session.query(db.func.sum(ExpenseMonthSummary.total))
+        .filter(ExpenseMonthSummary.user_id == user_id)
+        .scalar()
+        or 0
+    )
+
+
+def _page_query(model, user_id, limit, before, since, until, category_id, *criteria):
+    query = model.query.filter(model.user_id == user_id, *criteria)
+    if category_id is not None:
+        query = query.filter(model.category_id == category_id)
+    if since is not None:
+        query = query.filter(model.datetime >= since)
+    if until is not None:
+        query = query.filter(model.datetime < until)
+    if before is not None:
+        before_datetime, before_id = before
+        query = query.filter(
+            db.or_(
+                model.datetime < before_datetime,
+                db.and_(model.datetime == before_datetime, model.id < before_id),
+            )
+        )
+    return query.order_by(model.datetime.desc(), model.id.desc()).limit(limit + 1)
+
+
+def expense_page(
+    user_id, limit, before=None, since=None, until=None, category_id=None
+):
+    """One page of a user's expenses, newest first, as (rows, has_more).
+
+    `before` is a (datetime, id) keyset position. Rows are Expense or
+    ArchivedExpense objects (check `.archived`). The archive is only read
+    when the page reaches back past the user's archive watermark.
+    """
+    args = (user_id, limit, before, since, until, category_id)
+    rows = _page_query(Expense, *args).all()
+
+    watermark, published = archive_state(user_id)
+    # Archived rows are all older than the watermark, so they can only
+    # belong on this page if it is short or already reaches past it
+    if (
+        watermark is not None
+        and (since is None or since < watermark)
+        and (len(rows) <= limit or rows[-1].datetime < watermark)
+    ):
+        archived = _page_query(
+            ArchivedExpense, *args, ArchivedExpense.batch <= published
+        ).all()
+        rows = sorted(rows + archived, key=lambda row: (row.datetime, row.id))
+        rows.reverse()
+        rows = rows[: limit + 1]
+
+    return rows[:limit], len(rows) > limit
+
+
+def iter_expenses(user_id, since=None, until=None, chunk_size=1000):
+    """Every expense of a user in a date range, newest first, page by page."""
+    before = None
+    while True:
+        rows, has_more = expense_page(
+            user_id, chunk_size, before=before, since=since, until=until
+        )
+        yield from rows
+        if not has_more:
+            return
+        before = (rows[-1].datetime, rows[-1].id)
+
+
+@click.command("archive-expenses")
+@click.option(
+    "--date",
+    "run_date",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Treat this day as today (default: current UTC date).",
+)
+@click.option(
+    "--days",
+    type=int,
+    help="Archive expenses older than this many days "
+    "(default: ARCHIVE_AFTER_DAYS).",
+)
+@click.option("--batch-size", type=int, help="Expenses per transaction.")
+@with_appcontext
+def archive_expenses_command(run_date, days, batch_size):
+    """Move old expenses to the archive database."""
+    started = time.perf_counter()
+    moved, users = archive_expenses(now=run_date, days=days, batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+    message = f"Archived {moved} expenses of {users} users in {elapsed:.2f}s"
+    current_app.logger.info(message)
+    click.echo(message)
+
+
+def init_archive(app):
+    app.cli.add_command(archive_expenses_command)
@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import current_app, g
+
+from app import db
+from app.models import User
+
+
+class UserDataCache:
+    """Per-user cache of computed results, keyed by the user's data version.
+
+    The version lives on the user row (User.data_version) and is bumped in
+    the same transaction as every change to that user's expenses, whether it
+    comes from a request or a background job. Cached values are stored with
+    the version they were computed at, so a bump makes them stale at once.
+
+    At most `max_entries` results are kept; the least recently used go first.
+    """
+
+    def __init__(self, max_entries=10000):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_entries = max_entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, user_id, key, compute):
+        version, _ = get_data_version(user_id)
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end((user_id, key))
+                return entry[1]
+
+        value = compute()
+
+        with self._lock:
+            self._entries[(user_id, key)] = (version, value)
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+
+def get_data_version(user_id):
+    """(version, last modified) of a user's data, read once per app context."""
+    versions = g.setdefault("_data_versions", {})
+    if user_id not in versions:
+        row = (
+            db.session.query(User.data_version, User.data_modified_at)
+            .filter(User.id == user_id)
+            .first()
+        )
+        versions[user_id] = tuple(row) if row else (0, None)
+    return versions[user_id]
+
+
+def bump_data_version(*user_ids):
+    """Mark users' data as changed. Call before committing the change."""
+    db.session.execute(
+        db.update(User)
+        .where(User.id.in_(user_ids))
+        .values(
+            data_version=User.data_version + 1,
+            # HTTP dates have one-second resolution
+            data_modified_at=datetime.utcnow().replace(microsecond=0),
+        )
+    )
+    versions = g.get("_data_versions", {})
+    for user_id in user_ids:
+        versions.pop(user_id, None)
+
+
+def init_cache(app):
+    app.extensions["user_data_cache"] = UserDataCache(
+        app.config["USER_DATA_CACHE_SIZE"]
+    )
+
+
+def get_cache():
+    return current_app.extensions["user_data_cache"]
@@ -0,0 +1,164 @@
+import threading
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.cache import get_cache
+from app.models import Category, Expense, ExpenseMonthSummary
+
+
+def normalize_category(name):
+    """Return (key, display name) for a category typed by a user.
+
+    "Food", "food " and "FOOD" share the key "food". The display name keeps
+    the spelling it was first entered with, minus extra whitespace.
+    """
+    display = " ".join(name.split())
+    return display.casefold(), display
+
+
+class CategoryCache:
+    """Process-level map of category key -> id and id -> name.
+
+    Loaded in full on first use. Categories are never renamed or deleted, so
+    committed entries never go stale; a miss (e.g. a category created by
+    another process) falls back to a single-row query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._names = {}
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        rows = db.session.query(Category.id, Category.key, Category.name).all()
+        with self._lock:
+            for category_id, key, name in rows:
+                self._ids[key] = category_id
+                self._names[category_id] = name
+            self._loaded = True
+
+    def add(self, category_id, key, name):
+        with self._lock:
+            self._ids[key] = category_id
+            self._names[category_id] = name
+
+    def get_id(self, key):
+        self._load()
+        with self._lock:
+            category_id = self._ids.get(key)
+        if category_id is None:
+            category = Category.query.filter_by(key=key).first()
+            if category is not None:
+                self.add(category.id, category.key, category.name)
+                category_id = category.id
+        return category_id
+
+    def get_name(self, category_id):
+        self._load()
+        with self._lock:
+            name = self._names.get(category_id)
+        if name is None:
+            category = db.session.get(Category, category_id)
+            if category is not None:
+                self.add(category.id, category.key, category.name)
+                name = category.name
+        return name
+
+
+def get_category_cache():
+    return current_app.extensions["category_cache"]
+
+
+def find_category_id(name):
+    """Id of an existing category, or None. Never writes."""
+    key, _ = normalize_category(name)
+    pending = db.session.info.get("pending_categories", {})
+    if key in pending:
+        return pending[key][0]
+    return get_category_cache().get_id(key)
+
+
+def get_or_create_category_id(name):
+    """Id of the category for `name`, creating it if needed.
+
+    Known categories are answered from the cache without touching the DB.
+    New ones are only added to the cache once their transaction commits.
+    """
+    key, display = normalize_category(name)
+    if not key:
+        raise ValueError("category must not be blank")
+
+    category_id = find_category_id(name)
+    if category_id is not None:
+        return category_id
+
+    category = Category(key=key, name=display)
+    try:
+        # In a SAVEPOINT, so losing a race only undoes this insert
+        with db.session.begin_nested():
+            db.session.add(category)
+    except IntegrityError:
+        # Another request created it since we looked
+        category_id = get_category_cache().get_id(key)
+        if category_id is None:
+            raise
+        return category_id
+    db.session.info.setdefault("pending_categories", {})[key] = (
+        category.id,
+        category.key,
+        category.name,
+    )
+    return category.id
+
+
+def user_category_names(user_id, prefix=""):
+    """Sorted names of the categories a user has used, filtered by prefix."""
+    category_ids = get_cache().get_or_compute(
+        user_id,
+        "category_ids",
+        lambda: [
+            category_id
+            for (category_id,) in db.session.query(Expense.category_id)
+            .filter(Expense.user_id == user_id)
+            .union(
+                # Categories only used by archived expenses
+                db.session.query(ExpenseMonthSummary.category_id).filter(
+                    ExpenseMonthSummary.user_id == user_id
+                )
+            )
+        ],
+    )
+    cache = get_category_cache()
+    prefix, _ = normalize_category(prefix)
+    names = (cache.get_name(category_id) for category_id in category_ids)
+    return sorted(
+        (name for name in names if name and name.casefold().startswith(prefix)),
+        key=str.casefold,
+    )
+
+
+def init_categories(app):
+    app.extensions["category_cache"] = CategoryCache()
+
+
+@event.listens_for(db.session, "after_commit")
+def promote_pending_categories(session):
+    pending = session.info.pop("pending_categories", None)
+    if pending:
+        cache = get_category_cache()
+        for category_id, key, name in pending.values():
+            cache.add(category_id, key, name)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def forget_pending_categories(session, previous_transaction):
+    # Only the outermost transaction; a rolled back SAVEPOINT (see
+    # get_or_create_category_id) leaves the categories created before it
+    if previous_transaction.parent is None:
+        session.info.pop("pending_categories", None)
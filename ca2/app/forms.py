@@ -1,6 +1,22 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, FloatField, SubmitField, PasswordField
-from wtforms.validators import DataRequired, Email, Length, EqualTo
+from wtforms import (
+    StringField,
+    FloatField,
+    SubmitField,
+    PasswordField,
+    SelectField,
+    IntegerField,
+    DateField,
+)
+from wtforms.validators import (
+    DataRequired,
+    Email,
+    Length,
+    EqualTo,
+    NumberRange,
+    Optional,
+    ValidationError,
+)
 
 
 class RegisterForm(FlaskForm):
@@ -19,7 +35,34 @@ class LoginForm(FlaskForm):
 
 
 class ExpenseForm(FlaskForm):
-    category = StringField("Category", validators=[DataRequired()])
+    category = StringField(
+        "Category",
+        validators=[DataRequired(), Length(max=100)],
+        render_kw={"list": "category-options", "autocomplete": "off"},
+    )
     amount = FloatField("Amount (€)", validators=[DataRequired()])
     note = StringField("Note (optional)")
     submit = SubmitField("Add Expense")
+
+
+class RecurringExpenseForm(FlaskForm):
+    category = StringField(
+        "Category",
+        validators=[DataRequired(), Length(max=100)],
+        render_kw={"list": "category-options", "autocomplete": "off"},
+    )
+    amount = FloatField("Amount (€)", validators=[DataRequired()])
+    note = StringField("Note (optional)", validators=[Length(max=200)])
+    frequency = SelectField(
+        "Repeats", choices=[("monthly", "Monthly"), ("weekly", "Weekly")]
+    )
+    interval = IntegerField(
+        "Every (months/weeks)", default=1, validators=[NumberRange(min=1, max=52)]
+    )
+    start_date = DateField("First date", validators=[DataRequired()])
+    end_date = DateField("Last date (optional)", validators=[Optional()])
+    submit = SubmitField("Add Recurring Expense")
+
+    def validate_end_date(self, field):
+        if field.data and self.start_date.data and field.data < self.start_date.data:
+            raise ValidationError("Last date must not be before the first date.")
@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime
+from flask import current_app
 from werkzeug.security import generate_password_hash, check_password_hash
 
 
@@ -9,22 +10,148 @@ class User(db.Model):
     password_hash = db.Column(
         db.String(512), nullable=False
     )  # increased for hash length
+    # Bumped with every change to this user's expenses (see app/cache.py)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    data_modified_at = db.Column(
+        db.DateTime, default=lambda: datetime.utcnow().replace(microsecond=0)
+    )
+    # Expenses dated before this have been moved to the archive (app/archive.py)
+    archived_before = db.Column(db.DateTime)
+    # Last archive batch whose rows were summarized and deleted; later batches
+    # in the archive are unfinished copies (app/archive.py)
+    archive_batch = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     expenses = db.relationship("Expense", backref="user", lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(
+            password, method=current_app.config["PASSWORD_HASH_METHOD"]
+        )
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
 
+class Category(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # Normalized form used for lookups, see app.categories.normalize_category
+    key = db.Column(db.String(100), unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f"<Category {self.name}>"
+
+
 class Expense(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    category = db.Column(db.String(100), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey("category.id"), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     note = db.Column(db.String(200))
     datetime = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    # Set on expenses generated from a recurring rule
+    recurring_id = db.Column(db.Integer, db.ForeignKey("recurring_expense.id"))
+
+    category = db.relationship("Category", lazy="joined")
+
+    archived = False
+
+    __table_args__ = (
+        # Per-user listing in date order (also used for API keyset pagination)
+        db.Index("ix_expense_user_datetime", "user_id", "datetime", "id"),
+        # Per-user grouping by category
+        db.Index("ix_expense_user_category", "user_id", "category_id"),
+        # One expense per rule occurrence, makes materialization idempotent
+        db.Index(
+            "uq_expense_recurring_occurrence", "recurring_id", "datetime", unique=True
+        ),
+        # Never reuse the id of a deleted (or archived) row
+        {"sqlite_autoincrement": True},
+    )
 
     def __repr__(self):
         return f"<Expense {self.category} - €{self.amount}>"
+
+
+class RecurringExpense(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey("category.id"), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    note = db.Column(db.String(200))
+    frequency = db.Column(db.String(10), nullable=False)  # "weekly" or "monthly"
+    interval = db.Column(db.Integer, nullable=False, default=1)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date)
+    # Date of the next occurrence that has not been added as an expense yet
+    next_due = db.Column(db.Date, nullable=False)
+    active = db.Column(db.Boolean, nullable=False, default=True)
+
+    category = db.relationship("Category", lazy="joined")
+
+    __table_args__ = (db.Index("ix_recurring_expense_due", "active", "next_due", "id"),)
+
+    def __repr__(self):
+        return f"<RecurringExpense {self.category} - €{self.amount} {self.frequency}>"
+
+
+class ArchivedExpense(db.Model):
+    """Expense moved out of the working table by the archive job.
+
+    Lives in the "archive" bind (a separate database), so there are no
+    foreign keys. Keeps the id it had in the expense table.
+    """
+
+    __bind_key__ = "archive"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    category_id = db.Column(db.Integer, nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    note = db.Column(db.String(200))
+    datetime = db.Column(db.DateTime, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    recurring_id = db.Column(db.Integer)
+    archived_at = db.Column(db.DateTime, nullable=False)
+    # Listed once the user's archive_batch reaches it, i.e. in the same commit
+    # that deletes the rows from the expense table
+    batch = db.Column(db.Integer, nullable=False, server_default="0")
+
+    archived = True
+
+    __table_args__ = (
+        db.Index("ix_archived_expense_user_datetime", "user_id", "datetime", "id"),
+        db.Index("ix_archived_expense_user_batch", "user_id", "batch"),
+    )
+
+    @property
+    def category(self):
+        # Categories stay in the main database
+        return db.session.get(Category, self.category_id)
+
+    def __repr__(self):
+        return f"<ArchivedExpense {self.category} - €{self.amount}>"
+
+
+class ExpenseMonthSummary(db.Model):
+    """Totals of a user's archived expenses per month and category.
+
+    Updated in the same transaction that deletes the archived rows from the
+    expense table, so sums over expense plus this table are always exact.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    month = db.Column(db.String(7), nullable=False)  # YYYY-MM
+    category_id = db.Column(db.Integer, db.ForeignKey("category.id"), nullable=False)
+    total = db.Column(db.Float, nullable=False, default=0)
+    income = db.Column(db.Float, nullable=False, default=0)
+    spent = db.Column(db.Float, nullable=False, default=0)  # sum of negative amounts
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            "user_id", "month", "category_id", name="uq_expense_month_summary"
+        ),
+    )
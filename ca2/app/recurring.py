@@ -0,0 +1,133 @@
+import time
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import lazyload
+
+from app import db
+from app.cache import bump_data_version
+from app.models import Expense, RecurringExpense
+
+
+def next_occurrence(frequency, interval, anchor_day, current):
+    """Occurrence after `current`. Monthly rules keep their day of month,
+    clamped to short months (a rule started on the 31st runs on Feb 28)."""
+    if frequency == "weekly":
+        return current + timedelta(weeks=interval)
+    month = current.month - 1 + interval
+    year = current.year + month // 12
+    month = month % 12 + 1
+    return date(year, month, min(anchor_day, monthrange(year, month)[1]))
+
+
+def insert_ignoring_duplicates(table, bind_key=None):
+    # Re-runs (or two overlapping runs) must not add the same row twice
+    dialect = db.engines[bind_key].dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    return db.insert(table).prefix_with("IGNORE")  # MySQL
+
+
+def materialize_due(today=None, chunk_size=500):
+    """Add every due occurrence of every active rule, for all users.
+
+    Rules are processed in chunks of `chunk_size`. Each chunk is a single
+    transaction with one executemany insert, one bulk update of the rules and
+    one data version bump for the affected users. Returns
+    (expenses generated, rules processed).
+    """
+    today = today or datetime.utcnow().date()
+    insert = insert_ignoring_duplicates(Expense.__table__)
+    # rowcount of an executemany is -1 on some drivers (psycopg2), so count
+    # the ids of the rows actually inserted where the dialect can return them
+    returning = db.engines[None].dialect.insert_executemany_returning
+    if returning:
+        insert = insert.returning(Expense.id)
+    generated = processed = 0
+    last_id = 0
+
+    while True:
+        rules = (
+            db.session.query(RecurringExpense)
+            .options(lazyload(RecurringExpense.category))
+            .filter(
+                RecurringExpense.active.is_(True),
+                RecurringExpense.next_due <= today,
+                RecurringExpense.id > last_id,
+            )
+            .order_by(RecurringExpense.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not rules:
+            break
+
+        rows, updates = [], []
+        for rule in rules:
+            due = rule.next_due
+            while due <= today and (rule.end_date is None or due <= rule.end_date):
+                rows.append(
+                    {
+                        "user_id": rule.user_id,
+                        "category_id": rule.category_id,
+                        "amount": rule.amount,
+                        "note": rule.note,
+                        "datetime": datetime.combine(due, datetime.min.time()),
+                        "recurring_id": rule.id,
+                    }
+                )
+                due = next_occurrence(
+                    rule.frequency, rule.interval, rule.start_date.day, due
+                )
+            update = {"id": rule.id, "next_due": due}
+            if rule.end_date is not None and due > rule.end_date:
+                update["active"] = False
+            updates.append(update)
+
+        processed += len(rules)
+        last_id = rules[-1].id
+
+        if rows:
+            result = db.session.execute(insert, rows)
+            generated += len(result.all()) if returning else result.rowcount
+            bump_data_version(*{row["user_id"] for row in rows})
+        db.session.execute(db.update(RecurringExpense), updates)
+        db.session.commit()
+        # Don't let the identity map grow with every chunk
+        db.session.expunge_all()
+
+    return generated, processed
+
+
+@click.command("materialize-recurring")
+@click.option(
+    "--date",
+    "run_date",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Treat this day as today (default: current UTC date).",
+)
+@click.option("--chunk-size", default=500, show_default=True, help="Rules per transaction.")
+@with_appcontext
+def materialize_recurring_command(run_date, chunk_size):
+    """Add due occurrences of recurring expenses for all users."""
+    started = time.perf_counter()
+    generated, processed = materialize_due(
+        today=run_date.date() if run_date else None, chunk_size=chunk_size
+    )
+    elapsed = time.perf_counter() - started
+    message = (
+        f"Generated {generated} expenses from {processed} recurring rules "
+        f"in {elapsed:.2f}s"
+    )
+    current_app.logger.info(message)
+    click.echo(message)
+
+
+def init_recurring(app):
+    app.cli.add_command(materialize_recurring_command)
@@ -1,9 +1,35 @@
-from flask import Blueprint, render_template, redirect, url_for, session, request, flash
+from flask import (
+    Blueprint,
+    render_template,
+    redirect,
+    url_for,
+    session,
+    request,
+    flash,
+    jsonify,
+    abort,
+    make_response,
+    current_app,
+    Response,
+    stream_with_context,
+)
+from flask_wtf.csrf import generate_csrf
+from werkzeug.http import is_resource_modified
 from app import db
-from app.models import Expense, User
-from app.forms import ExpenseForm, RegisterForm, LoginForm
+from app.api import decode_cursor, encode_cursor
+from app.archive import archived_balance, expense_page, iter_expenses
+from app.analytics import PERIODS, category_totals, time_series
+from app.cache import bump_data_version, get_cache, get_data_version
+from app.categories import get_or_create_category_id, user_category_names
+from app.models import Expense, RecurringExpense, User
+from app.search import fts_enabled, search_expenses
+from app.forms import ExpenseForm, RegisterForm, LoginForm, RecurringExpenseForm
 from functools import wraps
 from datetime import datetime, timedelta
+import csv
+import hashlib
+import io
+import time
 
 main = Blueprint("main", __name__)
 
@@ -19,6 +45,92 @@ def login_required(f):
     return decorated_function
 
 
+# Conditional GET Decorator
+def _csrf_key():
+    # Forms on the page carry a token derived from the session's CSRF secret
+    # (new on every login) and timestamped by Flask-WTF. Revalidating within
+    # the same half of WTF_CSRF_TIME_LIMIT leaves the cached token valid for
+    # at least the other half.
+    generate_csrf()
+    secret = session[current_app.config["WTF_CSRF_FIELD_NAME"]]
+    key = hashlib.sha256(secret.encode()).hexdigest()[:16]
+    time_limit = current_app.config["WTF_CSRF_TIME_LIMIT"]
+    if time_limit:
+        key += f"-{int(time.time() // (time_limit / 2))}"
+    return key
+
+
+def conditional_on_user_data(extra_key=None, extra_modified=None, csrf=False):
+    """Answer 304 Not Modified when the user's data has not changed.
+
+    The ETag is built from the user's data version (bumped by add/delete), so
+    a matching validator lets us skip the queries and the template render.
+    `extra_key` adds anything else the page depends on, e.g. the current week,
+    and `extra_modified` the time it last changed, for Last-Modified. Pages
+    with forms pass `csrf=True`: their ETag follows the CSRF token, and
+    If-Modified-Since alone never answers 304 since the token has no date.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user_id = session["user_id"]
+            version, last_modified = get_data_version(user_id)
+            parts = [str(user_id), str(version)]
+            if extra_key:
+                parts.append(extra_key())
+            if csrf:
+                parts.append(_csrf_key())
+            etag = "-".join(parts)
+            if extra_modified:
+                last_modified = max(filter(None, (last_modified, extra_modified())))
+
+            # Pending flash messages must be rendered, never answered with 304
+            if not session.get("_flashes") and not is_resource_modified(
+                request.environ,
+                etag=etag,
+                last_modified=None if csrf else last_modified,
+            ):
+                response = make_response("", 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+
+        return decorated_function
+
+    return decorator
+
+
+def _start_of_week(now):
+    # Start of calendar week (Monday 00:00)
+    return (now - timedelta(days=now.weekday())).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def _start_of_month(now):
+    # Start of calendar month (1st day 00:00)
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _dashboard_period_key():
+    # Weekly/monthly totals roll over with the calendar, not only on writes
+    now = datetime.utcnow()
+    return f"{_start_of_week(now):%Y%m%d}-{_start_of_month(now):%Y%m}"
+
+
+def _dashboard_period_start():
+    # When the weekly/monthly totals last rolled over, for Last-Modified
+    now = datetime.utcnow()
+    return max(_start_of_week(now), _start_of_month(now))
+
+
 # Register
 @main.route("/register", methods=["GET", "POST"])
 def register():
@@ -62,27 +174,23 @@ def logout():
 # Home / Dashboard
 @main.route("/")
 @login_required
+@conditional_on_user_data(_dashboard_period_key, _dashboard_period_start)
 def index():
     user_id = session["user_id"]
     user = User.query.get(user_id)
 
     now = datetime.utcnow()
+    start_of_week = _start_of_week(now)
+    start_of_month = _start_of_month(now)
 
-    # Start of calendar week (Monday 00:00)
-    start_of_week = (now - timedelta(days=now.weekday())).replace(
-        hour=0, minute=0, second=0, microsecond=0
-    )
-
-    # Start of calendar month (1st day 00:00)
-    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    # ✅ Current balance (income + expenses)
+    # ✅ Current balance (income + expenses), archived ones come from the
+    # monthly summary
     current_balance = (
         db.session.query(db.func.sum(Expense.amount))
         .filter(Expense.user_id == user_id)
         .scalar()
         or 0
-    )
+    ) + archived_balance(user_id)
 
     # Money spent this calendar week (expenses only)
     spent_this_week = (
@@ -121,12 +229,60 @@ def index():
 # View Expenses
 @main.route("/expenses")
 @login_required
+@conditional_on_user_data(csrf=True)
 def expenses():
     user_id = session["user_id"]
-    all_expenses = (
-        Expense.query.filter_by(user_id=user_id).order_by(Expense.datetime.desc()).all()
+    before = None
+    if request.args.get("before"):
+        try:
+            before = decode_cursor(request.args["before"])
+        except ValueError:
+            abort(400)
+
+    page, has_more = expense_page(
+        user_id, current_app.config["EXPENSES_PER_PAGE"], before=before
     )
-    return render_template("expenses.html", expenses=all_expenses)
+    older = encode_cursor(page[-1]) if has_more else None
+    return render_template("expenses.html", expenses=page, older=older)
+
+
+# Export Expenses (CSV)
+@main.route("/expenses/export.csv")
+@login_required
+def export_expenses():
+    # Both dates inclusive, as YYYY-MM-DD
+    since = until = None
+    try:
+        if request.args.get("since"):
+            since = datetime.strptime(request.args["since"], "%Y-%m-%d")
+        if request.args.get("until"):
+            until = datetime.strptime(request.args["until"], "%Y-%m-%d")
+            until += timedelta(days=1)
+    except ValueError:
+        abort(400)
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["datetime", "category", "amount", "note"])
+        for expense in iter_expenses(session["user_id"], since=since, until=until):
+            writer.writerow(
+                [
+                    expense.datetime.isoformat(sep=" "),
+                    expense.category.name,
+                    expense.amount,
+                    expense.note or "",
+                ]
+            )
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    response = Response(stream_with_context(generate()), mimetype="text/csv")
+    response.headers["Content-Disposition"] = "attachment; filename=expenses.csv"
+    return response
 
 
 # Add Expense
@@ -136,16 +292,29 @@ def add_expense():
     form = ExpenseForm()
     if form.validate_on_submit():
         new_expense = Expense(
-            category=form.category.data,
+            category_id=get_or_create_category_id(form.category.data),
             amount=form.amount.data,
             note=form.note.data,
             user_id=session["user_id"],
         )
         db.session.add(new_expense)
+        bump_data_version(session["user_id"])
         db.session.commit()
         flash("Expense added.", "success")
         return redirect(url_for("main.expenses"))
-    return render_template("add_expense.html", form=form)
+    return render_template(
+        "add_expense.html",
+        form=form,
+        category_options=user_category_names(session["user_id"]),
+    )
+
+
+# Category Autocomplete (served from the category cache)
+@main.route("/categories/autocomplete")
+@login_required
+def category_autocomplete():
+    prefix = request.args.get("q", "")
+    return jsonify(user_category_names(session["user_id"], prefix)[:10])
 
 
 # Delete Expense
@@ -155,6 +324,109 @@ def delete_expense(expense_id):
     user_id = session["user_id"]
     expense = Expense.query.filter_by(id=expense_id, user_id=user_id).first_or_404()
     db.session.delete(expense)
+    bump_data_version(user_id)
     db.session.commit()
     flash("Expense deleted.", "info")
     return redirect(url_for("main.expenses"))
+
+
+def _analytics_data(user_id, period):
+    cache = get_cache()
+    return {
+        "period": period,
+        "categories": cache.get_or_compute(
+            user_id, "categories", lambda: category_totals(user_id)
+        ),
+        "series": cache.get_or_compute(
+            user_id, f"series:{period}", lambda: time_series(user_id, period)
+        ),
+    }
+
+
+# Analytics (spend by category and trend over time)
+@main.route("/analytics")
+@login_required
+def analytics():
+    period = request.args.get("period", "month")
+    if period not in PERIODS:
+        abort(400)
+    data = _analytics_data(session["user_id"], period)
+    return render_template("analytics.html", periods=PERIODS, **data)
+
+
+# Analytics JSON API
+@main.route("/analytics/data")
+@login_required
+def analytics_data():
+    period = request.args.get("period", "month")
+    if period not in PERIODS:
+        return jsonify({"error": f"period must be one of {', '.join(PERIODS)}"}), 400
+    return jsonify(_analytics_data(session["user_id"], period))
+
+
+# Search Expenses (category and note)
+@main.route("/search")
+@login_required
+def search():
+    q = request.args.get("q", "").strip()
+    page = max(request.args.get("page", 1, type=int), 1)
+    results, has_next = [], False
+    if q:
+        results, has_next = search_expenses(
+            session["user_id"],
+            q,
+            page=page,
+            use_fts=fts_enabled(),
+        )
+    return render_template(
+        "search.html", q=q, page=page, results=results, has_next=has_next
+    )
+
+
+# Recurring Expenses (added by the `flask materialize-recurring` job)
+@main.route("/recurring", methods=["GET", "POST"])
+@login_required
+def recurring():
+    user_id = session["user_id"]
+    form = RecurringExpenseForm()
+    if form.validate_on_submit():
+        rule = RecurringExpense(
+            user_id=user_id,
+            category_id=get_or_create_category_id(form.category.data),
+            amount=form.amount.data,
+            note=form.note.data,
+            frequency=form.frequency.data,
+            interval=form.interval.data,
+            start_date=form.start_date.data,
+            end_date=form.end_date.data,
+            next_due=form.start_date.data,
+        )
+        db.session.add(rule)
+        db.session.commit()
+        flash("Recurring expense added.", "success")
+        return redirect(url_for("main.recurring"))
+
+    rules = (
+        RecurringExpense.query.filter_by(user_id=user_id, active=True)
+        .order_by(RecurringExpense.next_due)
+        .all()
+    )
+    return render_template(
+        "recurring.html",
+        form=form,
+        rules=rules,
+        category_options=user_category_names(user_id),
+    )
+
+
+# Stop Recurring Expense (expenses already added are kept)
+@main.route("/recurring/<int:rule_id>/stop", methods=["POST"])
+@login_required
+def stop_recurring(rule_id):
+    rule = RecurringExpense.query.filter_by(
+        id=rule_id, user_id=session["user_id"]
+    ).first_or_404()
+    rule.active = False
+    db.session.commit()
+    flash("Recurring expense stopped.", "info")
+    return redirect(url_for("main.recurring"))
@@ -0,0 +1,197 @@
+import re
+
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import Category, Expense
+
+FTS_TABLE = "expense_fts"
+
+SEARCH_VIEW = "expense_search"
+
+# External-content FTS5 index over each expense's category name and note,
+# read through a view that joins the category table. The triggers keep it in
+# sync for every write path, including bulk deletes that bypass the ORM.
+# The owner column holds "u<user id>", so a search only walks the matches of
+# one user instead of filtering every user's matches after the fact.
+FTS_SETUP_SQL = [
+    f"""
+    CREATE VIEW IF NOT EXISTS {SEARCH_VIEW} AS
+    SELECT expense.id AS id, 'u' || expense.user_id AS owner,
+           category.name AS category, expense.note AS note
+    FROM expense JOIN category ON category.id = expense.category_id
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        owner, category, note,
+        content='{SEARCH_VIEW}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON expense BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, owner, category, note)
+        VALUES (
+            new.id,
+            'u' || new.user_id,
+            (SELECT name FROM category WHERE id = new.category_id),
+            new.note
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, owner, category, note)
+        VALUES (
+            'delete',
+            old.id,
+            'u' || old.user_id,
+            (SELECT name FROM category WHERE id = old.category_id),
+            old.note
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, owner, category, note)
+        VALUES (
+            'delete',
+            old.id,
+            'u' || old.user_id,
+            (SELECT name FROM category WHERE id = old.category_id),
+            old.note
+        );
+        INSERT INTO {FTS_TABLE}(rowid, owner, category, note)
+        VALUES (
+            new.id,
+            'u' || new.user_id,
+            (SELECT name FROM category WHERE id = new.category_id),
+            new.note
+        );
+    END
+    """,
+]
+
+
+def create_search_index():
+    """Create the FTS5 table and triggers. Returns False if FTS5 is unavailable."""
+    if db.engine.dialect.name != "sqlite":
+        return False
+    try:
+        with db.engine.begin() as conn:
+            exists = conn.execute(
+                db.text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+                {"name": FTS_TABLE},
+            ).first()
+            for statement in FTS_SETUP_SQL:
+                conn.execute(db.text(statement))
+            if not exists:
+                # Index rows that were added before the FTS table existed
+                conn.execute(
+                    db.text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+                )
+    except OperationalError:
+        # SQLite built without FTS5
+        return False
+    return True
+
+
+def init_search(app):
+    """Set up the FTS5 index alongside create_all, or detect it on first use."""
+    app.extensions["expense_fts"] = None
+    if app.config["SCHEMA_AUTO_CREATE"]:
+        with app.app_context():
+            app.extensions["expense_fts"] = create_search_index()
+
+
+def fts_enabled():
+    """Whether searches can use the FTS5 index (falls back to LIKE if not)."""
+    enabled = current_app.extensions.get("expense_fts")
+    if enabled is None:
+        enabled = (
+            db.engine.dialect.name == "sqlite"
+            and db.session.execute(
+                db.text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+                {"name": FTS_TABLE},
+            ).first()
+            is not None
+        )
+        current_app.extensions["expense_fts"] = enabled
+    return enabled
+
+
+def fts_query(text, user_id=None):
+    """Turn user input into a safe FTS5 query: every word, prefix matched.
+
+    With `user_id`, the query is limited to that user's rows.
+    """
+    terms = re.findall(r"\w+", text)
+    if not terms:
+        return ""
+    match = " ".join(f'"{term}"*' for term in terms)
+    if user_id is None:
+        return match
+    return f"owner : u{int(user_id)} AND {{category note}} : ({match})"
+
+
+def search_expenses(user_id, text, page=1, per_page=20, use_fts=True):
+    """Return (expenses, has_next) for one page of matches, best match first.
+
+    Very common words are answered newest first by the LIKE scan instead.
+    """
+    offset = (page - 1) * per_page
+
+    match = fts_query(text, user_id) if use_fts else ""
+    if match:
+        # One pass over the user's matches, capped: bm25 has to rank every
+        # match, while the LIKE scan below stops after the first page of
+        # newest rows, so very common words are cheaper there.
+        cap = current_app.config["SEARCH_FTS_MAX_MATCHES"]
+        hits = db.session.execute(
+            db.text(
+                f"""
+                SELECT expense.id, {FTS_TABLE}.rank, expense.datetime
+                FROM {FTS_TABLE}
+                -- CROSS JOIN keeps the index as the outer loop; SQLite would
+                -- otherwise walk the user's expenses and probe it per row
+                CROSS JOIN expense ON expense.id = {FTS_TABLE}.rowid
+                WHERE {FTS_TABLE} MATCH :match AND expense.user_id = :user_id
+                LIMIT :cap
+                """
+            ),
+            {"match": match, "user_id": user_id, "cap": cap + 1},
+        ).all()
+        if len(hits) > cap:
+            match = ""
+
+    if match:
+        # Best match first, newest first among equals
+        hits.sort(key=lambda hit: hit.datetime, reverse=True)
+        hits.sort(key=lambda hit: hit.rank)
+        ids = [hit.id for hit in hits[offset : offset + per_page + 1]]
+        found = {
+            expense.id: expense
+            for expense in Expense.query.filter(Expense.id.in_(ids))
+        }
+        rows = [found[expense_id] for expense_id in ids]
+    else:
+        terms = re.findall(r"\w+", text)
+        if not terms:
+            return [], False
+        query = Expense.query.join(Expense.category).filter(
+            Expense.user_id == user_id
+        )
+        for term in terms:
+            pattern = f"%{term}%"
+            query = query.filter(
+                db.or_(Category.name.ilike(pattern), Expense.note.ilike(pattern))
+            )
+        rows = (
+            query.order_by(Expense.datetime.desc())
+            .offset(offset)
+            .limit(per_page + 1)
+            .all()
+        )
+
+    return rows[:per_page], len(rows) > per_page
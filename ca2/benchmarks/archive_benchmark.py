@@ -0,0 +1,113 @@
+"""Time the archive job and the dashboard/listing queries around it.
+
+Usage: python benchmarks/archive_benchmark.py [--users 200] [--years 5] [--per-day 3]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import create_app, db
+from app.archive import archive_expenses, archived_balance, expense_page
+from app.categories import get_or_create_category_id
+from app.models import Expense, User
+
+NOW = datetime(2026, 10, 19)
+
+
+def populate(app, users, years, per_day):
+    random.seed(1)
+    with app.app_context():
+        db.session.execute(
+            db.insert(User),
+            [
+                {"email": f"user{n}@example.com", "password_hash": "x"}
+                for n in range(users)
+            ],
+        )
+        category_ids = [
+            get_or_create_category_id(name)
+            for name in ("Food", "Rent", "Travel", "Books", "Salary")
+        ]
+        user_ids = db.session.scalars(db.select(User.id)).all()
+        days = years * 365
+        for user_id in user_ids:
+            db.session.execute(
+                db.insert(Expense),
+                [
+                    {
+                        "user_id": user_id,
+                        "category_id": random.choice(category_ids),
+                        "amount": round(random.uniform(-50, 40), 2),
+                        "note": "Groceries",
+                        "datetime": NOW - timedelta(days=day, minutes=n),
+                    }
+                    for day in range(days)
+                    for n in range(per_day)
+                ],
+            )
+        db.session.commit()
+        return user_ids
+
+
+def time_reads(user_ids, label):
+    t0 = time.perf_counter()
+    for user_id in user_ids:
+        (
+            db.session.query(db.func.sum(Expense.amount))
+            .filter(Expense.user_id == user_id)
+            .scalar()
+            or 0
+        ) + archived_balance(user_id)
+    balance = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for user_id in user_ids:
+        expense_page(user_id, 50)
+    listing = time.perf_counter() - t0
+
+    count = len(user_ids)
+    print(f"{label:<8} balance {balance / count * 1000:6.2f} ms/user   "
+          f"first page {listing / count * 1000:6.2f} ms/user")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--per-day", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(
+            test_config={
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp}/bench.db",
+                "SCHEMA_AUTO_CREATE": True,
+                "SQLALCHEMY_BINDS": {"archive": f"sqlite:///{tmp}/archive.db"},
+            }
+        )
+        user_ids = populate(app, args.users, args.years, args.per_day)
+
+        with app.app_context():
+            print(f"{Expense.query.count()} expenses")
+            time_reads(user_ids, "before")
+
+            t0 = time.perf_counter()
+            moved, users = archive_expenses(
+                now=NOW, days=365, batch_size=args.batch_size
+            )
+            elapsed = time.perf_counter() - t0
+            print(f"archived {moved} expenses of {users} users in {elapsed:.2f}s")
+
+            time_reads(user_ids, "after")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Time a month-rollover run of the recurring expense job.
+
+Usage: python benchmarks/recurring_benchmark.py [--users 5000] [--rules 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import create_app, db
+from app.categories import get_or_create_category_id
+from app.models import RecurringExpense, User
+from app.recurring import materialize_due
+
+
+def populate(app, users, rules_per_user):
+    with app.app_context():
+        db.session.execute(
+            db.insert(User),
+            [
+                {"email": f"user{n}@example.com", "password_hash": "x"}
+                for n in range(users)
+            ],
+        )
+        category_ids = [
+            get_or_create_category_id(name)
+            for name in ("Rent", "Phone", "Streaming", "Gym")
+        ]
+        user_ids = db.session.scalars(db.select(User.id)).all()
+        db.session.execute(
+            db.insert(RecurringExpense),
+            [
+                {
+                    "user_id": user_id,
+                    "category_id": category_ids[n % len(category_ids)],
+                    "amount": -10.0 * (n + 1),
+                    "note": "Subscription",
+                    "frequency": "monthly",
+                    "interval": 1,
+                    "start_date": date(2026, 1, 1 + n),
+                    "next_due": date(2026, 1, 1 + n),
+                    "active": True,
+                }
+                for user_id in user_ids
+                for n in range(rules_per_user)
+            ],
+        )
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--rules", type=int, default=4, help="rules per user")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(
+            test_config={
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp}/bench.db",
+                "SQLALCHEMY_BINDS": {"archive": f"sqlite:///{tmp}/archive.db"},
+                "SCHEMA_AUTO_CREATE": True,
+            }
+        )
+        populate(app, args.users, args.rules)
+
+        with app.app_context():
+            # January was materialized last month, time the February rollover
+            materialize_due(today=date(2026, 1, 31), chunk_size=args.chunk_size)
+            for label, today in (("rollover", date(2026, 2, 28)), ("re-run", date(2026, 2, 28))):
+                t0 = time.perf_counter()
+                generated, processed = materialize_due(
+                    today=today, chunk_size=args.chunk_size
+                )
+                elapsed = time.perf_counter() - t0
+                print(f"{label:<10} {generated:>7} expenses from {processed:>6} rules "
+                      f"in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Compare FTS5 search against a LIKE scan on a large expense table.
+
+Usage: python benchmarks/search_benchmark.py [--rows 1000000] [--users 10]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import create_app, db
+from app.categories import get_or_create_category_id
+from app.models import User
+from app.search import search_expenses
+
+CATEGORIES = ["Food", "Rent", "Travel", "Bills", "Coffee", "Gym", "Books", "Salary"]
+WORDS = [
+    "lunch", "dinner", "train", "bus", "taxi", "electricity", "internet",
+    "groceries", "membership", "flight", "hotel", "cinema", "pharmacy",
+    "gift", "coffee", "parking", "insurance", "phone", "laundry", "tickets",
+]
+# Rare tokens, like merchant names, make up most real searches
+MERCHANTS = [f"shop{n:05d}" for n in range(20_000)]
+QUERIES = ["shop01234", "shop0777", "hotel flight", "taxi", "zzzz"]
+
+
+def populate(app, rows, users):
+    rng = random.Random(42)
+    start = datetime(2020, 1, 1)
+    with app.app_context():
+        for n in range(users):
+            user = User(email=f"user{n}@example.com")
+            user.set_password("password")
+            db.session.add(user)
+        db.session.commit()
+        user_ids = [user.id for user in User.query.all()]
+        category_ids = [get_or_create_category_id(name) for name in CATEGORIES]
+        db.session.commit()
+
+        insert = db.text(
+            "INSERT INTO expense (category_id, amount, note, datetime, user_id) "
+            "VALUES (:category_id, :amount, :note, :datetime, :user_id)"
+        )
+        chunk = 50_000
+        for offset in range(0, rows, chunk):
+            batch = [
+                {
+                    "category_id": rng.choice(category_ids),
+                    "amount": -round(rng.uniform(1, 200), 2),
+                    "note": " ".join(rng.sample(WORDS, 2) + [rng.choice(MERCHANTS)]),
+                    "datetime": start + timedelta(minutes=rng.randrange(3_000_000)),
+                    "user_id": rng.choice(user_ids),
+                }
+                for _ in range(min(chunk, rows - offset))
+            ]
+            db.session.execute(insert, batch)
+            db.session.commit()
+        return user_ids[0]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(
+            test_config={
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp}/bench.db",
+                "SQLALCHEMY_BINDS": {"archive": f"sqlite:///{tmp}/archive.db"},
+                "SCHEMA_AUTO_CREATE": True,
+            }
+        )
+
+        t0 = time.perf_counter()
+        user_id = populate(app, args.rows, args.users)
+        print(f"Inserted {args.rows} rows for {args.users} users "
+              f"in {time.perf_counter() - t0:.1f}s")
+
+        with app.app_context():
+            print(f"{'query':<14}{'fts ms':>10}{'like ms':>10}{'speedup':>10}")
+            for q in QUERIES:
+                fts, (fts_rows, _) = timed(
+                    lambda: search_expenses(user_id, q, use_fts=True), args.repeat
+                )
+                like, (like_rows, _) = timed(
+                    lambda: search_expenses(user_id, q, use_fts=False), args.repeat
+                )
+                print(f"{q:<14}{fts * 1000:>10.1f}{like * 1000:>10.1f}"
+                      f"{like / fts:>9.1f}x  ({len(fts_rows)}/{len(like_rows)} rows)")
+
+
+if __name__ == "__main__":
+    main()
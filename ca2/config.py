@@ -26,6 +26,39 @@ class Config:
     # Use SQLite (file-based DB in your project folder)
     SQLALCHEMY_DATABASE_URI = "sqlite:///finance_app.db"
 
+    # Cold storage for old expenses (see app/archive.py)
+    SQLALCHEMY_BINDS = {"archive": "sqlite:///finance_archive.db"}
+
+    # The schema is managed by Flask-Migrate:
+    #   flask db upgrade                         new or migrated database
+    #   flask db stamp 0001 && flask db upgrade  database built by create_all
+    #                                            before migrations existed
+    # SCHEMA_AUTO_CREATE=1 creates the tables on startup instead, for
+    # throwaway databases only. Never set it for `flask db` commands: the
+    # tables would exist before the migrations that create them run.
+    SCHEMA_AUTO_CREATE = os.environ.get("SCHEMA_AUTO_CREATE", "0") == "1"
+
+    # Any method accepted by werkzeug's generate_password_hash
+    PASSWORD_HASH_METHOD = "scrypt"
+
+    # Computed results kept per process (see app/cache.py), across all users
+    USER_DATA_CACHE_SIZE = 10000
+
+    # Searches matching more of a user's expenses than this skip bm25 ranking
+    # and list matches newest first (see app/search.py)
+    SEARCH_FTS_MAX_MATCHES = 500
+
+    # JSON API
+    API_TOKEN_EXPIRES = 3600  # seconds
+    API_MAX_BATCH = 1000  # items per batch create/delete request
+    API_MAX_PAGE = 500  # rows per list page
+
+    # Archival of old expenses (`flask archive-expenses`)
+    ARCHIVE_AFTER_DAYS = 365  # rounded down to the start of a month
+    ARCHIVE_BATCH_SIZE = 2000  # expenses moved per transaction
+
+    EXPENSES_PER_PAGE = 50
+
 
 '''class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
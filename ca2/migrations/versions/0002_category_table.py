@@ -0,0 +1,213 @@
+"""normalized category table
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 11:32:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+FTS_DROP = [
+    "DROP TRIGGER IF EXISTS expense_fts_ai",
+    "DROP TRIGGER IF EXISTS expense_fts_ad",
+    "DROP TRIGGER IF EXISTS expense_fts_au",
+    "DROP TABLE IF EXISTS expense_fts",
+    "DROP VIEW IF EXISTS expense_search",
+]
+
+# Same index as before, now reading the category name through a view
+FTS_UPGRADE = [
+    """
+    CREATE VIEW expense_search AS
+    SELECT expense.id AS id, category.name AS category, expense.note AS note
+    FROM expense JOIN category ON category.id = expense.category_id
+    """,
+    """
+    CREATE VIRTUAL TABLE expense_fts USING fts5(
+        category, note,
+        content='expense_search', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER expense_fts_ai AFTER INSERT ON expense BEGIN
+        INSERT INTO expense_fts(rowid, category, note)
+        VALUES (
+            new.id,
+            (SELECT name FROM category WHERE id = new.category_id),
+            new.note
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER expense_fts_ad AFTER DELETE ON expense BEGIN
+        INSERT INTO expense_fts(expense_fts, rowid, category, note)
+        VALUES (
+            'delete',
+            old.id,
+            (SELECT name FROM category WHERE id = old.category_id),
+            old.note
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER expense_fts_au AFTER UPDATE ON expense BEGIN
+        INSERT INTO expense_fts(expense_fts, rowid, category, note)
+        VALUES (
+            'delete',
+            old.id,
+            (SELECT name FROM category WHERE id = old.category_id),
+            old.note
+        );
+        INSERT INTO expense_fts(rowid, category, note)
+        VALUES (
+            new.id,
+            (SELECT name FROM category WHERE id = new.category_id),
+            new.note
+        );
+    END
+    """,
+    "INSERT INTO expense_fts(expense_fts) VALUES ('rebuild')",
+]
+
+# The 0001 index over the plain expense.category column
+FTS_DOWNGRADE = [
+    """
+    CREATE VIRTUAL TABLE expense_fts USING fts5(
+        category, note,
+        content='expense', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER expense_fts_ai AFTER INSERT ON expense BEGIN
+        INSERT INTO expense_fts(rowid, category, note)
+        VALUES (new.id, new.category, new.note);
+    END
+    """,
+    """
+    CREATE TRIGGER expense_fts_ad AFTER DELETE ON expense BEGIN
+        INSERT INTO expense_fts(expense_fts, rowid, category, note)
+        VALUES ('delete', old.id, old.category, old.note);
+    END
+    """,
+    """
+    CREATE TRIGGER expense_fts_au AFTER UPDATE ON expense BEGIN
+        INSERT INTO expense_fts(expense_fts, rowid, category, note)
+        VALUES ('delete', old.id, old.category, old.note);
+        INSERT INTO expense_fts(rowid, category, note)
+        VALUES (new.id, new.category, new.note);
+    END
+    """,
+    "INSERT INTO expense_fts(expense_fts) VALUES ('rebuild')",
+]
+
+
+def normalize_category(name):
+    # Frozen copy of app.categories.normalize_category
+    display = " ".join(name.split())
+    return display.casefold(), display
+
+
+def upgrade():
+    bind = op.get_bind()
+    is_sqlite = bind.dialect.name == "sqlite"
+
+    # The FTS triggers reference expense.category, drop them first
+    if is_sqlite:
+        for statement in FTS_DROP:
+            op.execute(statement)
+
+    category = op.create_table('category',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=100), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category_id', sa.Integer(), nullable=True))
+
+    # Data migration: one category per normalized name, named after its most
+    # common spelling, then point every expense at it in a single pass
+    # through a raw spelling -> category table
+    spellings = bind.execute(sa.text(
+        "SELECT category, COUNT(*) AS uses FROM expense "
+        "GROUP BY category ORDER BY uses DESC, category"
+    )).all()
+    names = {}
+    for raw, _ in spellings:
+        key, display = normalize_category(raw)
+        names.setdefault(key, display)
+
+    if names:
+        # The database assigns the ids, so PostgreSQL's sequence stays ahead
+        op.bulk_insert(category, [
+            {"key": key, "name": name} for key, name in sorted(names.items())
+        ])
+        ids = dict(bind.execute(sa.text("SELECT key, id FROM category")).all())
+        spelling = op.create_table('category_spelling',
+        sa.Column('raw', sa.String(length=100), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('raw')
+        )
+        op.bulk_insert(spelling, [
+            {"raw": raw, "category_id": ids[normalize_category(raw)[0]]}
+            for raw, _ in spellings
+        ])
+        bind.execute(sa.text(
+            "UPDATE expense SET category_id = (SELECT category_id "
+            "FROM category_spelling WHERE category_spelling.raw = expense.category)"
+        ))
+        op.drop_table('category_spelling')
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.alter_column('category_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key(
+            'fk_expense_category_id_category', 'category', ['category_id'], ['id']
+        )
+        batch_op.create_index(
+            'ix_expense_user_category', ['user_id', 'category_id'], unique=False
+        )
+        batch_op.drop_column('category')
+
+    if is_sqlite:
+        for statement in FTS_UPGRADE:
+            op.execute(statement)
+
+
+def downgrade():
+    bind = op.get_bind()
+    is_sqlite = bind.dialect.name == "sqlite"
+
+    if is_sqlite:
+        for statement in FTS_DROP:
+            op.execute(statement)
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category', sa.String(length=100), nullable=True))
+
+    bind.execute(sa.text(
+        "UPDATE expense SET category = "
+        "(SELECT name FROM category WHERE category.id = expense.category_id)"
+    ))
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.alter_column('category', existing_type=sa.String(length=100), nullable=False)
+        batch_op.drop_index('ix_expense_user_category')
+        batch_op.drop_constraint('fk_expense_category_id_category', type_='foreignkey')
+        batch_op.drop_column('category_id')
+
+    op.drop_table('category')
+
+    if is_sqlite:
+        for statement in FTS_DOWNGRADE:
+            op.execute(statement)
@@ -0,0 +1,139 @@
+"""recurring expenses and per-user data version
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 12:20:05.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# SQLite rebuilds the expense table to drop a column, which takes the FTS
+# triggers and view with it (see 0002)
+FTS_DROP = [
+    "DROP TRIGGER IF EXISTS expense_fts_ai",
+    "DROP TRIGGER IF EXISTS expense_fts_ad",
+    "DROP TRIGGER IF EXISTS expense_fts_au",
+    "DROP VIEW IF EXISTS expense_search",
+]
+
+FTS_RESTORE = [
+    """
+    CREATE VIEW expense_search AS
+    SELECT expense.id AS id, category.name AS category, expense.note AS note
+    FROM expense JOIN category ON category.id = expense.category_id
+    """,
+    """
+    CREATE TRIGGER expense_fts_ai AFTER INSERT ON expense BEGIN
+        INSERT INTO expense_fts(rowid, category, note)
+        VALUES (
+            new.id,
+            (SELECT name FROM category WHERE id = new.category_id),
+            new.note
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER expense_fts_ad AFTER DELETE ON expense BEGIN
+        INSERT INTO expense_fts(expense_fts, rowid, category, note)
+        VALUES (
+            'delete',
+            old.id,
+            (SELECT name FROM category WHERE id = old.category_id),
+            old.note
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER expense_fts_au AFTER UPDATE ON expense BEGIN
+        INSERT INTO expense_fts(expense_fts, rowid, category, note)
+        VALUES (
+            'delete',
+            old.id,
+            (SELECT name FROM category WHERE id = old.category_id),
+            old.note
+        );
+        INSERT INTO expense_fts(rowid, category, note)
+        VALUES (
+            new.id,
+            (SELECT name FROM category WHERE id = new.category_id),
+            new.note
+        );
+    END
+    """,
+]
+
+
+def upgrade():
+    op.add_column('user', sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('user', sa.Column('data_modified_at', sa.DateTime(), nullable=True))
+
+    op.create_table('recurring_expense',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('note', sa.String(length=200), nullable=True),
+    sa.Column('frequency', sa.String(length=10), nullable=False),
+    sa.Column('interval', sa.Integer(), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=True),
+    sa.Column('next_due', sa.Date(), nullable=False),
+    sa.Column('active', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['category.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_recurring_expense_due', 'recurring_expense', ['active', 'next_due', 'id'], unique=False)
+
+    # A nullable column with a foreign key can be added in place, even on
+    # SQLite, so the expense table (and its FTS triggers) is left alone.
+    # Alembic only knows how to do that for SQLite in batch mode, which would
+    # rebuild the table, so emit the DDL directly there.
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute(
+            "ALTER TABLE expense ADD COLUMN recurring_id INTEGER "
+            "CONSTRAINT fk_expense_recurring_id_recurring_expense "
+            "REFERENCES recurring_expense (id)"
+        )
+    else:
+        op.add_column('expense', sa.Column('recurring_id', sa.Integer(), nullable=True))
+        op.create_foreign_key(
+            'fk_expense_recurring_id_recurring_expense',
+            'expense', 'recurring_expense', ['recurring_id'], ['id'],
+        )
+    op.create_index('uq_expense_recurring_occurrence', 'expense', ['recurring_id', 'datetime'], unique=True)
+
+
+def downgrade():
+    is_sqlite = op.get_bind().dialect.name == "sqlite"
+    if is_sqlite:
+        for statement in FTS_DROP:
+            op.execute(statement)
+
+    op.drop_index('uq_expense_recurring_occurrence', table_name='expense')
+    if not is_sqlite:
+        # SQLite's table rebuild drops the inline constraint with the column
+        op.drop_constraint(
+            'fk_expense_recurring_id_recurring_expense', 'expense', type_='foreignkey'
+        )
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.drop_column('recurring_id')
+
+    if is_sqlite:
+        for statement in FTS_RESTORE:
+            op.execute(statement)
+
+    op.drop_index('ix_recurring_expense_due', table_name='recurring_expense')
+    op.drop_table('recurring_expense')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('data_modified_at')
+        batch_op.drop_column('data_version')
@@ -0,0 +1,46 @@
+"""expense archive watermark and monthly summary
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 14:05:31.270918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+# The archived_expense table lives in the "archive" bind, which this
+# single-database environment does not manage. `flask archive-expenses`
+# creates it on first run.
+
+
+def upgrade():
+    op.add_column('user', sa.Column('archived_before', sa.DateTime(), nullable=True))
+
+    op.create_table('expense_month_summary',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.String(length=7), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('income', sa.Float(), nullable=False),
+    sa.Column('spent', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['category.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'month', 'category_id', name='uq_expense_month_summary')
+    )
+
+
+def downgrade():
+    op.drop_table('expense_month_summary')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('archived_before')
@@ -0,0 +1,99 @@
+"""scope the search index to the expense owner
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 16:42:08.513370
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+FTS_DROP = [
+    "DROP TRIGGER IF EXISTS expense_fts_ai",
+    "DROP TRIGGER IF EXISTS expense_fts_ad",
+    "DROP TRIGGER IF EXISTS expense_fts_au",
+    "DROP TABLE IF EXISTS expense_fts",
+    "DROP VIEW IF EXISTS expense_search",
+]
+
+
+def fts_setup(owner):
+    # Frozen copy of app.search.FTS_SETUP_SQL, with or without the owner column
+    column = "owner, " if owner else ""
+    value = "'u' || {row}.user_id, " if owner else ""
+    old = value.format(row="old")
+    new = value.format(row="new")
+    view_owner = "'u' || expense.user_id AS owner, " if owner else ""
+    return [
+        f"""
+        CREATE VIEW expense_search AS
+        SELECT expense.id AS id, {view_owner}
+               category.name AS category, expense.note AS note
+        FROM expense JOIN category ON category.id = expense.category_id
+        """,
+        f"""
+        CREATE VIRTUAL TABLE expense_fts USING fts5(
+            {column}category, note,
+            content='expense_search', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        f"""
+        CREATE TRIGGER expense_fts_ai AFTER INSERT ON expense BEGIN
+            INSERT INTO expense_fts(rowid, {column}category, note)
+            VALUES (
+                new.id, {new}
+                (SELECT name FROM category WHERE id = new.category_id),
+                new.note
+            );
+        END
+        """,
+        f"""
+        CREATE TRIGGER expense_fts_ad AFTER DELETE ON expense BEGIN
+            INSERT INTO expense_fts(expense_fts, rowid, {column}category, note)
+            VALUES (
+                'delete', old.id, {old}
+                (SELECT name FROM category WHERE id = old.category_id),
+                old.note
+            );
+        END
+        """,
+        f"""
+        CREATE TRIGGER expense_fts_au AFTER UPDATE ON expense BEGIN
+            INSERT INTO expense_fts(expense_fts, rowid, {column}category, note)
+            VALUES (
+                'delete', old.id, {old}
+                (SELECT name FROM category WHERE id = old.category_id),
+                old.note
+            );
+            INSERT INTO expense_fts(rowid, {column}category, note)
+            VALUES (
+                new.id, {new}
+                (SELECT name FROM category WHERE id = new.category_id),
+                new.note
+            );
+        END
+        """,
+        "INSERT INTO expense_fts(expense_fts) VALUES ('rebuild')",
+    ]
+
+
+def rebuild_index(owner):
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for statement in FTS_DROP + fts_setup(owner):
+        op.execute(statement)
+
+
+def upgrade():
+    rebuild_index(owner=True)
+
+
+def downgrade():
+    rebuild_index(owner=False)
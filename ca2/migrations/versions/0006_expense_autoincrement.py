@@ -0,0 +1,99 @@
+"""never reuse expense ids, numbered archive batches
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 18:10:44.902715
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# Rebuilding the expense table takes the FTS triggers and view with it. The
+# index itself is keyed by expense id, which the rebuild keeps.
+FTS_DROP = [
+    "DROP TRIGGER IF EXISTS expense_fts_ai",
+    "DROP TRIGGER IF EXISTS expense_fts_ad",
+    "DROP TRIGGER IF EXISTS expense_fts_au",
+    "DROP VIEW IF EXISTS expense_search",
+]
+
+# As created by 0005
+FTS_RESTORE = [
+    """
+    CREATE VIEW expense_search AS
+    SELECT expense.id AS id, 'u' || expense.user_id AS owner,
+           category.name AS category, expense.note AS note
+    FROM expense JOIN category ON category.id = expense.category_id
+    """,
+    """
+    CREATE TRIGGER expense_fts_ai AFTER INSERT ON expense BEGIN
+        INSERT INTO expense_fts(rowid, owner, category, note)
+        VALUES (
+            new.id, 'u' || new.user_id,
+            (SELECT name FROM category WHERE id = new.category_id),
+            new.note
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER expense_fts_ad AFTER DELETE ON expense BEGIN
+        INSERT INTO expense_fts(expense_fts, rowid, owner, category, note)
+        VALUES (
+            'delete', old.id, 'u' || old.user_id,
+            (SELECT name FROM category WHERE id = old.category_id),
+            old.note
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER expense_fts_au AFTER UPDATE ON expense BEGIN
+        INSERT INTO expense_fts(expense_fts, rowid, owner, category, note)
+        VALUES (
+            'delete', old.id, 'u' || old.user_id,
+            (SELECT name FROM category WHERE id = old.category_id),
+            old.note
+        );
+        INSERT INTO expense_fts(rowid, owner, category, note)
+        VALUES (
+            new.id, 'u' || new.user_id,
+            (SELECT name FROM category WHERE id = new.category_id),
+            new.note
+        );
+    END
+    """,
+]
+
+
+def rebuild_expense(autoincrement):
+    # Only SQLite reuses ids without AUTOINCREMENT; other backends keep a
+    # sequence that never goes back
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for statement in FTS_DROP:
+        op.execute(statement)
+    with op.batch_alter_table(
+        'expense',
+        recreate='always',
+        table_kwargs={'sqlite_autoincrement': autoincrement},
+    ):
+        pass
+    for statement in FTS_RESTORE:
+        op.execute(statement)
+
+
+def upgrade():
+    op.add_column('user', sa.Column('archive_batch', sa.Integer(), server_default='0', nullable=False))
+    rebuild_expense(autoincrement=True)
+
+
+def downgrade():
+    rebuild_expense(autoincrement=False)
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('archive_batch')
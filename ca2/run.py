@@ -1,11 +1,8 @@
-from app import create_app, db
+from app import create_app
 
+# Create or update the tables with `flask db upgrade` first (see config.py)
 app = create_app()
 
-with app.app_context():
-    ## db.drop_all()
-    db.create_all()
-
 
 if __name__ == "__main__":
     app.run(debug=True)
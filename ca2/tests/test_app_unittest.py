@@ -1,12 +1,78 @@
 import unittest
+from unittest import mock
 import sys
 import os
+import time
+from datetime import date, datetime
 
 # Ensure root folder is in Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from sqlalchemy import event
+
 from app import create_app, db
-from app.models import User, Expense
+from app.cache import UserDataCache, init_cache
+from app.categories import (
+    find_category_id,
+    get_or_create_category_id,
+    init_categories,
+)
+from app.archive import archive_expenses, expense_page
+from app.models import (
+    User,
+    Expense,
+    Category,
+    RecurringExpense,
+    ArchivedExpense,
+    ExpenseMonthSummary,
+)
+from app.recurring import materialize_due
+from app.search import create_search_index, fts_enabled, search_expenses
+
+app = None
+
+
+def do_connect(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+
+def do_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+def setUpModule():
+    """Create the app and schema once for the whole run"""
+    global app
+    app = create_app(
+        test_config={
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "SQLALCHEMY_BINDS": {"archive": "sqlite:///:memory:"},
+            "WTF_CSRF_ENABLED": False,
+            "SECRET_KEY": "test-secret",
+            "SCHEMA_AUTO_CREATE": False,
+            "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",  # fast, tests only
+        }
+    )
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # Let SQLAlchemy emit BEGIN itself so SAVEPOINTs work with pysqlite
+            event.listen(engine, "connect", do_connect)
+            event.listen(engine, "begin", do_begin)
+
+        db.create_all()
+        create_search_index()
+
+        # Commits inside the app only release a SAVEPOINT of the test transaction
+        db.session.remove()
+        db.session.configure(join_transaction_mode="create_savepoint")
+
+
+def tearDownModule():
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
 
 
 class TestFlaskApp(unittest.TestCase):
@@ -14,26 +80,32 @@ class TestFlaskApp(unittest.TestCase):
     # Setup and Teardown
 
     def setUp(self):
-        """Create a fresh app + database before each test"""
-        self.app = create_app(
-            test_config={
-                "TESTING": True,
-                "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
-                "WTF_CSRF_ENABLED": False,
-                "SECRET_KEY": "test-secret",
-            }
-        )
-
-        self.client = self.app.test_client()
+        """Run each test inside an outer transaction that is rolled back"""
+        self.app = app
+        # Fresh caches, ids are reused once the transaction is rolled back
+        init_cache(self.app)
+        init_categories(self.app)
 
         with self.app.app_context():
-            db.create_all()
+            self.engines = dict(db.engines)
+            self.connections = {}
+            self.transactions = {}
+            for key, engine in self.engines.items():
+                self.connections[key] = engine.connect()
+                self.transactions[key] = self.connections[key].begin()
+                # Every session in every app context now joins this connection
+                db.engines[key] = self.connections[key]
+
+        self.client = self.app.test_client()
 
     def tearDown(self):
-        """Destroy database after each test"""
+        """Undo everything the test wrote"""
         with self.app.app_context():
             db.session.remove()
-            db.drop_all()
+            for key, engine in self.engines.items():
+                self.transactions[key].rollback()
+                self.connections[key].close()
+                db.engines[key] = engine
 
     def register_user(self, email="test@example.com", password="password"):
         return self.client.post(
@@ -53,6 +125,12 @@ class TestFlaskApp(unittest.TestCase):
             follow_redirects=True,
         )
 
+    def api_token(self, email="test@example.com", password="password"):
+        response = self.client.post(
+            "/api/token", json={"email": email, "password": password}
+        )
+        return {"Authorization": f"Bearer {response.get_json()['token']}"}
+
     # TEST CASES
 
     def test1_register(self):
@@ -132,6 +210,816 @@ class TestFlaskApp(unittest.TestCase):
         with self.app.app_context():
             self.assertEqual(Expense.query.count(), 0)
 
+    def test9_analytics_groups_by_category_and_month(self):
+        """Analytics API totals expenses per category and per month"""
+        self.register_user()
+        self.login_user()
+
+        self.client.post("/add", data={"category": "Food", "amount": -10, "note": "Lunch"})
+        self.client.post("/add", data={"category": "Food", "amount": -5, "note": "Snack"})
+        self.client.post("/add", data={"category": "Salary", "amount": 100, "note": ""})
+
+        response = self.client.get("/analytics/data?period=month")
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+
+        by_category = {row["category"]: row for row in data["categories"]}
+        self.assertEqual(by_category["Food"]["spent"], 15)
+        self.assertEqual(by_category["Food"]["count"], 2)
+        self.assertEqual(by_category["Salary"]["total"], 100)
+
+        self.assertEqual(len(data["series"]), 1)
+        self.assertEqual(data["series"][0]["income"], 100)
+        self.assertEqual(data["series"][0]["spent"], 15)
+        self.assertEqual(data["series"][0]["net"], 85)
+
+        response = self.client.get("/analytics?period=week")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Food", response.data)
+
+    def test10_analytics_cache_invalidated_on_add_and_delete(self):
+        """Cached analytics are refreshed after adding or deleting an expense"""
+        self.register_user()
+        self.login_user()
+
+        self.client.post("/add", data={"category": "Bills", "amount": -40, "note": ""})
+        first = self.client.get("/analytics/data").get_json()
+        self.assertEqual(first["categories"][0]["spent"], 40)
+
+        self.client.post("/add", data={"category": "Bills", "amount": -60, "note": ""})
+        second = self.client.get("/analytics/data").get_json()
+        self.assertEqual(second["categories"][0]["spent"], 100)
+
+        with self.app.app_context():
+            expense = Expense.query.first()
+        self.client.post(f"/delete/{expense.id}")
+        third = self.client.get("/analytics/data").get_json()
+        self.assertEqual(third["categories"][0]["spent"], 60)
+
+    def test11_analytics_rejects_unknown_period(self):
+        """Unknown period is a client error"""
+        self.register_user()
+        self.login_user()
+        response = self.client.get("/analytics/data?period=year")
+        self.assertEqual(response.status_code, 400)
+
+    def test12_conditional_get_returns_304(self):
+        """Dashboard and expenses answer 304 when the ETag still matches"""
+        self.register_user()
+        self.login_user()
+        self.client.get("/")  # consume the login flash message
+
+        for url in ("/", "/expenses"):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            self.assertIsNotNone(first.headers.get("ETag"))
+            self.assertIsNotNone(first.headers.get("Last-Modified"))
+
+            second = self.client.get(
+                url, headers={"If-None-Match": first.headers["ETag"]}
+            )
+            self.assertEqual(second.status_code, 304)
+            self.assertEqual(second.data, b"")
+
+    def test13_conditional_get_invalidated_by_add_and_delete(self):
+        """Adding or deleting an expense changes the ETag"""
+        self.register_user()
+        self.login_user()
+        self.client.get("/")
+
+        etag = self.client.get("/expenses").headers["ETag"]
+
+        self.client.post("/add", data={"category": "Food", "amount": -8, "note": "Pizza"})
+        self.client.get("/expenses")  # consume the "Expense added" flash message
+        response = self.client.get("/expenses", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Pizza", response.data)
+        etag = response.headers["ETag"]
+
+        with self.app.app_context():
+            expense = Expense.query.first()
+        self.client.post(f"/delete/{expense.id}")
+        self.client.get("/expenses")
+        response = self.client.get("/expenses", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b"Pizza", response.data)
+
+    def test14_conditional_get_keeps_pending_flash(self):
+        """A pending flash message forces a full render instead of 304"""
+        self.register_user()
+        self.login_user()
+        etag = self.client.get("/").headers["ETag"]
+
+        self.client.get("/logout")
+        self.client.post(
+            "/login", data={"email": "test@example.com", "password": "password"}
+        )
+        response = self.client.get("/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Logged in successfully", response.data)
+
+    def test15_api_requires_token(self):
+        """API rejects requests without a valid bearer token"""
+        self.register_user()
+        response = self.client.get("/api/expenses")
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.post(
+            "/api/token", json={"email": "test@example.com", "password": "wrong"}
+        )
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.get(
+            "/api/expenses", headers={"Authorization": "Bearer not-a-token"}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test16_api_batch_create_and_delete(self):
+        """Batch endpoints create and delete many expenses in one request"""
+        self.register_user()
+        headers = self.api_token()
+
+        response = self.client.post(
+            "/api/expenses/batch",
+            headers=headers,
+            json={
+                "expenses": [
+                    {"category": "Food", "amount": -12.5, "note": "Lunch"},
+                    {"category": "Rent", "amount": -900},
+                    {"category": "Salary", "amount": 2500,
+                     "datetime": "2025-01-31T09:00:00"},
+                ]
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        created = response.get_json()["created"]
+        self.assertEqual(len(created), 3)
+
+        with self.app.app_context():
+            self.assertEqual(Expense.query.count(), 3)
+
+        ids = [created[0]["id"], created[1]["id"], 9999]
+        response = self.client.post(
+            "/api/expenses/batch-delete", headers=headers, json={"ids": ids}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["deleted"], sorted(ids[:2]))
+        self.assertEqual(response.get_json()["not_found"], [9999])
+
+        with self.app.app_context():
+            self.assertEqual(Expense.query.count(), 1)
+
+    def test17_api_batch_create_is_all_or_nothing(self):
+        """One invalid item rejects the whole batch"""
+        self.register_user()
+        headers = self.api_token()
+
+        response = self.client.post(
+            "/api/expenses/batch",
+            headers=headers,
+            json={
+                "expenses": [
+                    {"category": "Food", "amount": -5},
+                    {"category": "", "amount": -5},
+                ]
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("expenses[1]", response.get_json()["error"])
+
+        with self.app.app_context():
+            self.assertEqual(Expense.query.count(), 0)
+
+    def test18_api_list_keyset_pagination(self):
+        """Listing pages through expenses newest first using a cursor"""
+        self.register_user()
+        headers = self.api_token()
+
+        self.client.post(
+            "/api/expenses/batch",
+            headers=headers,
+            json={
+                "expenses": [
+                    {"category": "Food" if day % 2 else "Travel", "amount": -day,
+                     "datetime": f"2025-03-{day:02d}T12:00:00"}
+                    for day in range(1, 6)
+                ]
+            },
+        )
+
+        seen = []
+        cursor = None
+        while True:
+            url = "/api/expenses?limit=2" + (f"&cursor={cursor}" if cursor else "")
+            data = self.client.get(url, headers=headers).get_json()
+            seen.extend(expense["amount"] for expense in data["expenses"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(seen, [-5, -4, -3, -2, -1])
+
+        data = self.client.get(
+            "/api/expenses?category=Travel&since=2025-03-03T00:00:00",
+            headers=headers,
+        ).get_json()
+        self.assertEqual([e["amount"] for e in data["expenses"]], [-4])
+
+    def test19_search_finds_notes_and_categories(self):
+        """Full-text search matches category and note for the current user only"""
+        self.register_user("other@example.com")
+        self.login_user("other@example.com")
+        self.client.post("/add", data={"category": "Groceries", "amount": -3, "note": "Other"})
+        self.client.get("/logout")
+
+        self.register_user()
+        self.login_user()
+        self.client.post("/add", data={"category": "Groceries", "amount": -20, "note": "Weekly shop"})
+        self.client.post("/add", data={"category": "Travel", "amount": -15, "note": "Train to Galway"})
+
+        response = self.client.get("/search?q=groc")
+        self.assertIn(b"Weekly shop", response.data)
+        self.assertNotIn(b"Other", response.data)
+        self.assertNotIn(b"Train to Galway", response.data)
+
+        response = self.client.get("/search?q=galway")
+        self.assertIn(b"Train to Galway", response.data)
+
+    def test20_search_index_follows_deletes(self):
+        """Deleted expenses, including batch deletes, drop out of the index"""
+        self.register_user()
+        headers = self.api_token()
+        created = self.client.post(
+            "/api/expenses/batch",
+            headers=headers,
+            json={"expenses": [{"category": "Gym", "amount": -30, "note": "Membership"}]},
+        ).get_json()["created"]
+
+        with self.app.app_context():
+            user_id = User.query.first().id
+            self.assertTrue(fts_enabled())
+            self.assertEqual(len(search_expenses(user_id, "membership")[0]), 1)
+
+        self.client.post(
+            "/api/expenses/batch-delete",
+            headers=headers,
+            json={"ids": [created[0]["id"]]},
+        )
+
+        with self.app.app_context():
+            self.assertEqual(search_expenses(user_id, "membership")[0], [])
+
+    def test21_search_like_fallback_and_pagination(self):
+        """LIKE fallback returns the same matches, one page at a time"""
+        self.register_user()
+        headers = self.api_token()
+        self.client.post(
+            "/api/expenses/batch",
+            headers=headers,
+            json={"expenses": [
+                {"category": "Coffee", "amount": -3, "note": f"Cup {i}"}
+                for i in range(5)
+            ]},
+        )
+
+        with self.app.app_context():
+            user_id = User.query.first().id
+            for use_fts in (True, False):
+                first, has_next = search_expenses(
+                    user_id, "coffee", page=1, per_page=3, use_fts=use_fts
+                )
+                self.assertEqual((len(first), has_next), (3, True))
+                second, has_next = search_expenses(
+                    user_id, "coffee", page=2, per_page=3, use_fts=use_fts
+                )
+                self.assertEqual((len(second), has_next), (2, False))
+
+    def test22_categories_are_normalized(self):
+        """Differently typed names share one category row"""
+        self.register_user()
+        self.login_user()
+
+        for name in ("Food", "food ", "FOOD", "  Eating   Out "):
+            self.client.post("/add", data={"category": name, "amount": -1, "note": ""})
+
+        with self.app.app_context():
+            self.assertEqual(
+                sorted(c.name for c in Category.query.all()), ["Eating Out", "Food"]
+            )
+            self.assertEqual(Expense.query.count(), 4)
+
+        data = self.client.get("/analytics/data").get_json()
+        by_category = {row["category"]: row["count"] for row in data["categories"]}
+        self.assertEqual(by_category, {"Food": 3, "Eating Out": 1})
+
+    def test23_known_category_lookup_skips_database(self):
+        """Known categories are resolved from the cache without a query"""
+        self.register_user()
+        self.login_user()
+        self.client.post("/add", data={"category": "Rent", "amount": -900, "note": ""})
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with self.app.app_context():
+            event.listen(self.connections[None], "before_cursor_execute", record)
+            try:
+                category_id = get_or_create_category_id(" rent")
+            finally:
+                event.remove(self.connections[None], "before_cursor_execute", record)
+            self.assertEqual(db.session.get(Category, category_id).name, "Rent")
+        self.assertEqual(statements, [])
+
+    def test24_category_autocomplete(self):
+        """Autocomplete suggests only the current user's categories"""
+        self.register_user("other@example.com")
+        self.login_user("other@example.com")
+        self.client.post("/add", data={"category": "Fishing", "amount": -5, "note": ""})
+        self.client.get("/logout")
+
+        self.register_user()
+        self.login_user()
+        for name in ("Food", "Fuel", "Rent"):
+            self.client.post("/add", data={"category": name, "amount": -5, "note": ""})
+
+        response = self.client.get("/categories/autocomplete?q=f")
+        self.assertEqual(response.get_json(), ["Food", "Fuel"])
+
+        response = self.client.get("/add")
+        self.assertIn(b'<option value="Rent">', response.data)
+        self.assertNotIn(b"Fishing", response.data)
+
+    def add_recurring(self, **fields):
+        data = {
+            "category": "Rent",
+            "amount": -900,
+            "note": "Flat",
+            "frequency": "monthly",
+            "interval": 1,
+            "start_date": "2026-01-31",
+        }
+        data.update(fields)
+        return self.client.post("/recurring", data=data, follow_redirects=True)
+
+    def test25_recurring_rule_materializes_once(self):
+        """Due occurrences are added once, re-runs add nothing"""
+        self.register_user()
+        self.login_user()
+        response = self.add_recurring()
+        self.assertIn(b"Recurring expense added", response.data)
+
+        with self.app.app_context():
+            self.assertEqual(materialize_due(today=date(2026, 4, 30)), (4, 1))
+            self.assertEqual(materialize_due(today=date(2026, 4, 30)), (0, 0))
+
+            dates = [e.datetime.date() for e in Expense.query.order_by(Expense.datetime)]
+            self.assertEqual(
+                dates,
+                [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)],
+            )
+            self.assertEqual(RecurringExpense.query.one().next_due, date(2026, 5, 31))
+
+    def test26_recurring_rule_end_date_and_stop(self):
+        """Rules finish at their end date and stopped rules are skipped"""
+        self.register_user()
+        self.login_user()
+        self.add_recurring(frequency="weekly", interval=2, start_date="2026-03-02",
+                           end_date="2026-03-20", note="Cleaner")
+        self.add_recurring(category="Gym", amount=-30, note="Membership",
+                           start_date="2026-03-01")
+
+        with self.app.app_context():
+            gym = RecurringExpense.query.filter_by(note="Membership").one()
+        self.client.post(f"/recurring/{gym.id}/stop")
+
+        with self.app.app_context():
+            self.assertEqual(materialize_due(today=date(2026, 6, 1)), (2, 1))
+            cleaner = RecurringExpense.query.filter_by(note="Cleaner").one()
+            self.assertFalse(cleaner.active)
+            self.assertEqual(Expense.query.filter_by(note="Membership").count(), 0)
+
+    def test27_recurring_job_invalidates_cached_pages(self):
+        """The job bumps the data version, so caches and ETags refresh"""
+        self.register_user()
+        self.login_user()
+        self.add_recurring(start_date="2026-01-01")
+        self.client.get("/")
+
+        self.assertEqual(self.client.get("/analytics/data").get_json()["categories"], [])
+        etag = self.client.get("/expenses").headers["ETag"]
+
+        result = self.app.test_cli_runner().invoke(
+            args=["materialize-recurring", "--date", "2026-02-15", "--chunk-size", "1"]
+        )
+        self.assertIn("Generated 2 expenses from 1 recurring rules", result.output)
+
+        data = self.client.get("/analytics/data").get_json()
+        self.assertEqual(data["categories"][0]["spent"], 1800)
+        response = self.client.get("/expenses", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def add_history(self, headers):
+        """Three expenses from 2024 and two recent ones, via the API"""
+        items = [
+            {"category": "Food", "amount": -10, "datetime": "2024-01-05T09:00:00"},
+            {"category": "Salary", "amount": 100, "datetime": "2024-01-20T09:00:00"},
+            {"category": "Food", "amount": -5, "datetime": "2024-02-03T09:00:00"},
+            {"category": "Food", "amount": -20, "datetime": "2026-09-01T09:00:00"},
+            {"category": "Books", "amount": -15, "datetime": "2026-09-02T09:00:00"},
+        ]
+        self.client.post("/api/expenses/batch", json={"expenses": items}, headers=headers)
+
+    def test28_archive_keeps_totals_exact(self):
+        """Archived expenses leave the working table, totals stay the same"""
+        self.register_user()
+        self.login_user()
+        self.add_history(self.api_token())
+
+        balance = self.client.get("/").data
+        analytics = self.client.get("/analytics/data").get_json()
+        monthly = self.client.get("/analytics/data?period=month").get_json()
+        weekly = self.client.get("/analytics/data?period=week").get_json()
+
+        result = self.app.test_cli_runner().invoke(
+            args=["archive-expenses", "--date", "2026-10-19", "--days", "365"]
+        )
+        self.assertIn("Archived 3 expenses of 1 users", result.output)
+
+        with self.app.app_context():
+            self.assertEqual(Expense.query.count(), 2)
+            self.assertEqual(ArchivedExpense.query.count(), 3)
+            self.assertEqual(ExpenseMonthSummary.query.count(), 3)
+        self.assertIn(b"\xe2\x82\xac50.0", balance)
+        self.assertEqual(self.client.get("/").data, balance)
+        self.assertEqual(self.client.get("/analytics/data").get_json(), analytics)
+        self.assertEqual(self.client.get("/analytics/data?period=month").get_json(), monthly)
+        self.assertEqual(self.client.get("/analytics/data?period=week").get_json(), weekly)
+        self.assertIn("Salary", self.client.get("/categories/autocomplete?q=sal").get_json())
+
+    def test29_listing_reads_archive_only_when_paging_back(self):
+        """Recent pages come from the working table, older ones union the archive"""
+        self.register_user()
+        headers = self.api_token()
+        self.add_history(headers)
+        with self.app.app_context():
+            self.assertEqual(archive_expenses(now=datetime(2026, 10, 19), days=365), (3, 1))
+
+        archive_queries = []
+
+        def record(conn, cursor, statement, *args):
+            archive_queries.append(statement)
+
+        event.listen(self.connections["archive"], "before_cursor_execute", record)
+        try:
+            first = self.client.get("/api/expenses?limit=1", headers=headers).get_json()
+            self.assertEqual(archive_queries, [])
+
+            pages = [first]
+            while pages[-1]["next_cursor"]:
+                pages.append(
+                    self.client.get(
+                        f"/api/expenses?limit=1&cursor={pages[-1]['next_cursor']}",
+                        headers=headers,
+                    ).get_json()
+                )
+        finally:
+            event.remove(self.connections["archive"], "before_cursor_execute", record)
+
+        rows = [row for page in pages for row in page["expenses"]]
+        self.assertEqual([row["amount"] for row in rows], [-15, -20, -5, 100, -10])
+        self.assertEqual([row["archived"] for row in rows], [False, False, True, True, True])
+        self.assertTrue(archive_queries)
+
+        self.login_user()
+        self.app.config["EXPENSES_PER_PAGE"] = 2
+        try:
+            response = self.client.get("/expenses")
+            self.assertNotIn(b"Archived", response.data)
+            self.assertIn(b"Older expenses", response.data)
+            older = response.data.split(b"before=")[1].split(b'"')[0].decode()
+            response = self.client.get(f"/expenses?before={older}")
+            self.assertEqual(response.data.count(b"Archived"), 2)
+        finally:
+            self.app.config["EXPENSES_PER_PAGE"] = 50
+
+    def test30_export_unions_archive_for_old_ranges(self):
+        """CSV export covers archived expenses in the requested range"""
+        self.register_user()
+        self.login_user()
+        self.add_history(self.api_token())
+        with self.app.app_context():
+            archive_expenses(now=datetime(2026, 10, 19), days=365)
+
+        response = self.client.get("/expenses/export.csv?since=2024-01-01&until=2024-01-31")
+        self.assertEqual(response.mimetype, "text/csv")
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(lines[0], "datetime,category,amount,note")
+        self.assertEqual(
+            lines[1:],
+            ["2024-01-20 09:00:00,Salary,100.0,", "2024-01-05 09:00:00,Food,-10.0,"],
+        )
+
+        lines = self.client.get("/expenses/export.csv").get_data(as_text=True).splitlines()
+        self.assertEqual(len(lines), 6)
+
+    def test31_archive_rerun_after_interrupted_copy(self):
+        """Copies left by an interrupted run are never listed, then dropped"""
+        self.register_user()
+        headers = self.api_token()
+        self.add_history(headers)
+
+        with self.app.app_context():
+            # A run that died after committing the copy of the oldest row
+            expense = Expense.query.order_by(Expense.datetime).first()
+            copied_id = expense.id
+            db.session.add(
+                ArchivedExpense(
+                    id=expense.id,
+                    user_id=expense.user_id,
+                    category_id=expense.category_id,
+                    amount=expense.amount,
+                    datetime=expense.datetime,
+                    archived_at=datetime(2026, 10, 18),
+                    batch=1,
+                )
+            )
+            db.session.commit()
+
+        rows = self.client.get("/api/expenses", headers=headers).get_json()["expenses"]
+        self.assertEqual(len(rows), 5)
+        self.assertFalse(any(row["archived"] for row in rows))
+
+        # The user deletes the copied row before the next run
+        response = self.client.post(
+            "/api/expenses/batch-delete", headers=headers, json={"ids": [copied_id]}
+        )
+        self.assertEqual(response.get_json()["deleted"], [copied_id])
+
+        with self.app.app_context():
+            self.assertEqual(archive_expenses(now=datetime(2026, 10, 19), days=365), (2, 1))
+            self.assertEqual(archive_expenses(now=datetime(2026, 10, 19), days=365), (0, 0))
+            self.assertIsNone(db.session.get(ArchivedExpense, copied_id))
+            self.assertEqual(ArchivedExpense.query.count(), 2)
+            self.assertEqual(
+                db.session.query(db.func.sum(ExpenseMonthSummary.count)).scalar(), 2
+            )
+
+        rows = self.client.get("/api/expenses", headers=headers).get_json()["expenses"]
+        self.assertEqual([row["amount"] for row in rows], [-15, -20, -5, 100])
+
+    def test32_user_data_cache_is_bounded(self):
+        """The per-user result cache evicts the least recently used entries"""
+        cache = UserDataCache(max_entries=2)
+        calls = []
+
+        def compute(user_id):
+            calls.append(user_id)
+            return user_id
+
+        with self.app.app_context():
+            for user_id in (1, 2, 1, 3, 1, 2):
+                cache.get_or_compute(user_id, "totals", lambda: compute(user_id))
+
+        self.assertEqual(len(cache), 2)
+        # 1 stays cached because it was used again, 2 was evicted by 3
+        self.assertEqual(calls, [1, 2, 3, 2])
+
+    def test33_search_is_scoped_to_owner_and_skips_ranking_common_words(self):
+        """Other users' matches cost nothing, very common words skip bm25"""
+        for email, count in (("a@example.com", 2), ("b@example.com", 6)):
+            self.register_user(email=email)
+            self.client.post(
+                "/api/expenses/batch",
+                headers=self.api_token(email=email),
+                json={"expenses": [
+                    {"category": "Coffee", "amount": -3, "note": f"Cup {i}"}
+                    for i in range(count)
+                ]},
+            )
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        self.app.config["SEARCH_FTS_MAX_MATCHES"] = 3
+        event.listen(self.connections[None], "before_cursor_execute", record)
+        try:
+            with self.app.app_context():
+                first, second = (
+                    User.query.filter_by(email=email).one().id
+                    for email in ("a@example.com", "b@example.com")
+                )
+                self.assertEqual(len(search_expenses(first, "coffee")[0]), 2)
+                self.assertFalse(any(" LIKE " in s for s in statements))
+
+                statements.clear()
+                self.assertEqual(len(search_expenses(second, "coffee")[0]), 6)
+                self.assertTrue(any(" LIKE " in s for s in statements))
+        finally:
+            event.remove(self.connections[None], "before_cursor_execute", record)
+            self.app.config["SEARCH_FTS_MAX_MATCHES"] = 500
+
+    def test34_category_created_concurrently_is_reused(self):
+        """Losing the insert race returns the other request's category"""
+        with self.app.app_context():
+            food_id = get_or_create_category_id("Food")
+            # Another request commits "Travel" between our lookup and insert
+            db.session.execute(
+                db.insert(Category).values(key="travel", name="Travel")
+            )
+            travel_id = db.session.scalar(
+                db.select(Category.id).filter_by(key="travel")
+            )
+
+            cache = self.app.extensions["category_cache"]
+            real_get_id = type(cache).get_id
+            with mock.patch.object(
+                type(cache), "get_id", autospec=True, side_effect=[None, travel_id]
+            ):
+                self.assertEqual(get_or_create_category_id("travel "), travel_id)
+
+            # Only the SAVEPOINT was rolled back, "Food" is still pending
+            self.assertEqual(find_category_id("food"), food_id)
+            db.session.commit()
+            self.assertEqual(real_get_id(cache, "food"), food_id)
+
+    def test35_archived_expense_ids_are_never_reused(self):
+        """A new expense never takes the id of an archived one"""
+        self.register_user()
+        headers = self.api_token()
+        self.add_history(headers)
+        old = {"category": "Food", "amount": -1, "datetime": "2024-03-01T09:00:00"}
+        highest = self.client.post(
+            "/api/expenses/batch", headers=headers, json={"expenses": [old]}
+        ).get_json()["created"][0]["id"]
+
+        with self.app.app_context():
+            self.assertEqual(archive_expenses(now=datetime(2026, 10, 19), days=365), (4, 1))
+
+        # Backdated after the archive run, picked up by the next one
+        old["amount"] = -2
+        created = self.client.post(
+            "/api/expenses/batch", headers=headers, json={"expenses": [old]}
+        ).get_json()["created"][0]["id"]
+        self.assertGreater(created, highest)
+
+        with self.app.app_context():
+            self.assertEqual(archive_expenses(now=datetime(2026, 11, 19), days=365), (1, 1))
+            self.assertEqual(db.session.get(ArchivedExpense, highest).amount, -1)
+            self.assertEqual(db.session.get(ArchivedExpense, created).amount, -2)
+
+        response = self.client.post(
+            "/api/expenses/batch-delete",
+            headers=headers,
+            json={"ids": [highest, created, 9999]},
+        )
+        self.assertEqual(
+            response.get_json(),
+            {"deleted": [], "archived": [highest, created], "not_found": [9999]},
+        )
+
+    def csrf_token_in(self, response):
+        return response.data.split(b'name="csrf_token" value="')[1].split(b'"')[0]
+
+    def test36_cached_expenses_page_follows_csrf_token(self):
+        """A new login or an aging CSRF token makes /expenses render again"""
+        self.register_user()
+        self.login_user()
+        self.client.post("/add", data={"category": "Food", "amount": -8, "note": ""})
+        self.client.get("/expenses")  # consume the "Expense added" flash message
+        with self.app.app_context():
+            expense_id = Expense.query.one().id
+
+        self.app.config["WTF_CSRF_ENABLED"] = True
+        try:
+            response = self.client.get("/expenses")
+            etag, old_token = response.headers["ETag"], self.csrf_token_in(response)
+            self.assertEqual(
+                self.client.get("/expenses", headers={"If-None-Match": etag}).status_code,
+                304,
+            )
+
+            # The token expires while the data stays the same
+            limit = self.app.config["WTF_CSRF_TIME_LIMIT"]
+            with mock.patch("app.routes.time") as clock:
+                clock.time.return_value = time.time() + limit / 2
+                response = self.client.get("/expenses", headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 200)
+
+            self.client.get("/logout")
+            self.app.config["WTF_CSRF_ENABLED"] = False
+            self.login_user()
+            self.app.config["WTF_CSRF_ENABLED"] = True
+            self.client.get("/")  # consume the login flash message
+
+            response = self.client.get("/expenses", headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 200)
+            # If-Modified-Since alone cannot tell that the token changed
+            response = self.client.get(
+                "/expenses",
+                headers={"If-Modified-Since": response.headers["Last-Modified"]},
+            )
+            self.assertEqual(response.status_code, 200)
+            new_token = self.csrf_token_in(response)
+
+            response = self.client.post(
+                f"/delete/{expense_id}", data={"csrf_token": old_token}
+            )
+            self.assertEqual(response.status_code, 400)
+            response = self.client.post(
+                f"/delete/{expense_id}", data={"csrf_token": new_token}
+            )
+            self.assertEqual(response.status_code, 302)
+        finally:
+            self.app.config["WTF_CSRF_ENABLED"] = False
+
+    def test37_dashboard_last_modified_follows_period_rollover(self):
+        """If-Modified-Since does not hide a new week or month on the dashboard"""
+        self.register_user()
+        self.login_user()
+        self.client.get("/")  # consume the login flash message
+        with self.app.app_context():
+            db.session.execute(
+                db.update(User).values(data_modified_at=datetime(2020, 1, 6))
+            )
+            db.session.commit()
+
+        response = self.client.get(
+            "/", headers={"If-Modified-Since": "Mon, 06 Jan 2020 00:00:00 GMT"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(
+            response.last_modified.replace(tzinfo=None), datetime(2020, 1, 6)
+        )
+        response = self.client.get(
+            "/", headers={"If-Modified-Since": response.headers["Last-Modified"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test38_reads_before_the_archive_exists(self):
+        """Before the first archive run nothing reads the archive database"""
+        self.register_user()
+        self.login_user()
+        headers = self.api_token()
+        self.add_history(headers)
+        # As after `flask db upgrade`: the job creates the table on first run
+        self.connections["archive"].execute(db.text("DROP TABLE archived_expense"))
+
+        response = self.client.post(
+            "/api/expenses/batch-delete", headers=headers, json={"ids": [9999]}
+        )
+        self.assertEqual(
+            response.get_json(), {"deleted": [], "archived": [], "not_found": [9999]}
+        )
+        rows = self.client.get("/api/expenses?limit=2", headers=headers).get_json()
+        self.assertEqual(len(rows["expenses"]), 2)
+        lines = self.client.get("/expenses/export.csv?since=2024-01-01").data.splitlines()
+        self.assertEqual(len(lines), 6)
+        series = self.client.get("/analytics/data?period=week").get_json()["series"]
+        self.assertEqual(sum(row["count"] for row in series), 5)
+
+    def test39_interrupted_run_keeps_since_filtered_reads_complete(self):
+        """Rows archived by an unfinished run are still found by since= reads"""
+        self.register_user()
+        self.login_user()
+        headers = self.api_token()
+        self.add_history(headers)
+        with self.app.app_context():
+            archive_expenses(now=datetime(2026, 10, 19), days=365)  # before 2025-10
+        items = [
+            {"category": "Food", "amount": -1, "datetime": f"{day}T09:00:00"}
+            for day in ("2025-10-10", "2025-10-20", "2025-11-05")
+        ]
+        self.client.post("/api/expenses/batch", headers=headers, json={"expenses": items})
+
+        with self.app.app_context():
+            # Dies while archiving its second batch of one row
+            with mock.patch(
+                "app.archive.bump_data_version", side_effect=[None, RuntimeError]
+            ):
+                with self.assertRaises(RuntimeError):
+                    archive_expenses(
+                        now=datetime(2026, 12, 19), days=365, batch_size=1
+                    )
+            db.session.rollback()
+            user_id = User.query.one().id
+            self.assertEqual(ArchivedExpense.query.count(), 5)  # one unfinished
+
+            rows, _ = expense_page(user_id, 50, since=datetime(2025, 10, 5))
+            self.assertEqual(
+                [row.datetime.date() for row in rows],
+                [
+                    date(2026, 9, 2),
+                    date(2026, 9, 1),
+                    date(2025, 11, 5),
+                    date(2025, 10, 20),
+                    date(2025, 10, 10),
+                ],
+            )
+            self.assertEqual([row.archived for row in rows], [False] * 4 + [True])
+
 
 if __name__ == "__main__":
     unittest.main()